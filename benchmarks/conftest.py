@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from constructive_geometries import ConstructiveGeometries, Geomatcher
+
+# The grid faces GeoPackage is shared with the test fixtures
+sys.path.insert(0, str(Path(__file__).parent.parent / "tests"))
+from grid_faces import write_grid_faces  # noqa: E402
+
+COLUMNS, ROWS, BLOCK = 40, 20, 5
+
+
+def grid_definitions(columns=COLUMNS, rows=ROWS, block=BLOCK) -> dict:
+    """Face ids of each row (``"R0"``, ...), column (``"C0"``, ...), and ``block * block`` square (``"B0-0"``, ...) of the grid."""
+    data = {}
+    for row in range(rows):
+        data["R{}".format(row)] = [row * columns + c + 1 for c in range(columns)]
+    for column in range(columns):
+        data["C{}".format(column)] = [r * columns + column + 1 for r in range(rows)]
+    for top in range(0, rows, block):
+        for left in range(0, columns, block):
+            data["B{}-{}".format(top, left)] = [
+                r * columns + c + 1
+                for r in range(top, min(top + block, rows))
+                for c in range(left, min(left + block, columns))
+            ]
+    return data
+
+
+@pytest.fixture(scope="session")
+def grid_cg(tmp_path_factory):
+    """``ConstructiveGeometries`` using a synthetic grid of ``COLUMNS * ROWS`` faces, with locations from ``grid_definitions``."""
+    pytest.importorskip("shapely")
+    cg = ConstructiveGeometries(lazy_check=True)
+    cg.faces_fp = write_grid_faces(
+        tmp_path_factory.mktemp("grid") / "faces.gpkg", COLUMNS, ROWS
+    )
+    cg.checked = True
+    cg.data = grid_definitions()
+    cg.all_faces = set(range(1, COLUMNS * ROWS + 1))
+    cg.locations = set(cg.data)
+    return cg
+
+
+@pytest.fixture(params=[False, True], ids=["sets", "bitsets"])
+def geomatcher(request):
+    """Fresh ecoinvent ``Geomatcher``, with face sets stored as sets and as bitsets."""
+    return Geomatcher(use_bitsets=request.param)
@@ -0,0 +1,148 @@
+import pickle
+
+import pytest
+
+from constructive_geometries import ConstructiveGeometries, FrozenGeomatcher, Geomatcher
+from constructive_geometries import geomatcher as geomatcher_module
+from constructive_geometries import resolved_row
+
+COUNTRY_NAMES = ["Germany", "Switzerland", "France", "Japan", "Brazil", "Kenya"]
+ROW_EXCLUDED = ["RER", "US", "CN", "IN", "BR"]
+ONLY = ["RER", "Europe without Switzerland", "CH", "DE", "FR", "IT", "AT", "WEU"]
+
+
+def test_constructive_geometries_startup(benchmark):
+    benchmark(ConstructiveGeometries, lazy_check=True)
+
+
+def test_constructive_geometries_startup_checked(benchmark):
+    # Needs the shipped ``faces.gpkg``; the hash is cached after the first round
+    if not ConstructiveGeometries(lazy_check=True).faces_fp.exists():
+        pytest.skip("faces.gpkg not available")
+    benchmark(ConstructiveGeometries)
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True], ids=["sets", "bitsets"])
+def test_geomatcher_construction(benchmark, use_bitsets):
+    benchmark(Geomatcher, use_bitsets=use_bitsets)
+
+
+def test_actual_key_namespace(benchmark, geomatcher):
+    benchmark(lambda: [geomatcher._actual_key(key) for key in ONLY])
+
+
+def _clear_key_caches(geomatcher):
+    geomatcher._resolved.clear()
+    geomatcher_module._COUNTRY_NAMES.clear()
+
+
+@pytest.mark.parametrize("cached", [False, True], ids=["uncached", "cached"])
+def test_actual_key_coco(benchmark, geomatcher, cached):
+    def resolve():
+        return [geomatcher._actual_key(name) for name in COUNTRY_NAMES]
+
+    if cached:
+        resolve()
+        benchmark(resolve)
+    else:
+        benchmark.pedantic(
+            resolve, setup=lambda: _clear_key_caches(geomatcher), rounds=10
+        )
+
+
+def test_resolve_many_coco(benchmark, geomatcher):
+    benchmark.pedantic(
+        geomatcher.resolve_many,
+        args=(COUNTRY_NAMES,),
+        setup=lambda: _clear_key_caches(geomatcher),
+        rounds=10,
+    )
+
+
+def test_actual_key_without_coco(benchmark):
+    geomatcher = Geomatcher(use_coco=False)
+
+    def resolve():
+        for name in COUNTRY_NAMES:
+            try:
+                geomatcher._actual_key(name)
+            except KeyError:
+                pass
+
+    benchmark(resolve)
+
+
+QUERIES = {
+    "plain": {},
+    "exclusive": {"exclusive": True},
+    "only": {"only": ONLY},
+}
+
+
+@pytest.mark.parametrize("kwargs", QUERIES.values(), ids=QUERIES.keys())
+@pytest.mark.parametrize("method", ["intersects", "contained", "within"])
+def test_query(benchmark, geomatcher, method, kwargs):
+    key = "CH" if method == "within" else "RER"
+    # Build the indices outside of the measured rounds
+    getattr(geomatcher, method)(key, **kwargs)
+    benchmark(getattr(geomatcher, method), key, **kwargs)
+
+
+@pytest.mark.parametrize("method", ["intersects", "contained", "within"])
+def test_query_glo_exclusive(benchmark, geomatcher, method):
+    key = "CH" if method == "within" else "GLO"
+    getattr(geomatcher, method)(key, exclusive=True)
+    benchmark(getattr(geomatcher, method), key, exclusive=True)
+
+
+def test_resolved_row(benchmark, geomatcher):
+    def row_contained():
+        with resolved_row(ROW_EXCLUDED, geomatcher) as g:
+            return g.contained("RoW")
+
+    benchmark(row_contained)
+
+
+def test_with_row(benchmark, geomatcher):
+    def row_contained():
+        (row,) = geomatcher.rest_of_worlds([ROW_EXCLUDED])
+        return geomatcher.with_row(row).contained("RoW")
+
+    geomatcher.hierarchy, geomatcher.inverted_index
+    benchmark(row_contained)
+
+
+def test_unpickle_frozen(benchmark, geomatcher):
+    """Baseline for ``from_packed``: receiving a pickled snapshot in a worker process."""
+    data = pickle.dumps(geomatcher.freeze())
+    benchmark(pickle.loads, data)
+
+
+def test_from_packed(benchmark, geomatcher):
+    benchmark(FrozenGeomatcher.from_packed, geomatcher.pack())
+
+
+def test_from_packed_query(benchmark, geomatcher):
+    """``from_packed`` and a first query, which decodes the face sets it needs."""
+    data = geomatcher.pack()
+    benchmark(lambda: FrozenGeomatcher.from_packed(data).intersects("DE"))
+
+
+@pytest.mark.parametrize("number", [1, 100])
+def test_split_face(benchmark, number):
+    base = Geomatcher()
+    faces = sorted(base.faces)[:number]
+
+    def setup():
+        geomatcher = Geomatcher(
+            topology={key: set(value) for key, value in base.topology.items()},
+            default_namespace="ecoinvent",
+        )
+        geomatcher.hierarchy, geomatcher.inverted_index
+        return (geomatcher,), {}
+
+    def split(geomatcher):
+        for face in faces:
+            geomatcher.split_face(face, number=4)
+
+    benchmark.pedantic(split, setup=setup, rounds=10)
@@ -0,0 +1,86 @@
+import pytest
+
+from constructive_geometries.cg import FaceGeometries, UnionTree
+
+pytest.importorskip("fiona")
+pytest.importorskip("shapely")
+
+
+def excluded(grid_cg, number=20) -> dict:
+    """``number`` rest-of-world definitions, each excluding a few blocks, rows, and columns of the grid."""
+    blocks = sorted(key for key in grid_cg.data if key.startswith("B"))
+    return {
+        "RoW-{}".format(i): [
+            blocks[i % len(blocks)],
+            blocks[(3 * i + 1) % len(blocks)],
+            "R{}".format(i % 20),
+            "C{}".format((7 * i) % 40),
+        ]
+        for i in range(number)
+    }
+
+
+def test_read_face_geometries(benchmark, grid_cg):
+    benchmark(FaceGeometries, grid_cg.faces_fp)
+
+
+def test_union_faces(benchmark, grid_cg):
+    faces = grid_cg.face_geometries()
+    ids = sorted(grid_cg.all_faces)[: len(grid_cg.all_faces) // 2]
+    benchmark(faces.union, ids)
+
+
+def test_union_tree(benchmark, grid_cg):
+    faces = grid_cg.face_geometries()
+    order = grid_cg.face_order()
+    ids = [
+        grid_cg.all_faces.difference(
+            face for location in locations for face in grid_cg.data[location]
+        )
+        for locations in excluded(grid_cg).values()
+    ]
+
+    def union_all():
+        # A fresh tree each round, so that cached pieces are only shared between definitions
+        tree = UnionTree(faces, order)
+        return [tree.union(included) for included in ids]
+
+    benchmark(union_all)
+
+
+def test_construct_rest_of_worlds_mapping(benchmark, grid_cg):
+    benchmark(grid_cg.construct_rest_of_worlds_mapping, excluded(grid_cg, 100))
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_construct_rest_of_worlds(benchmark, grid_cg, processes):
+    benchmark.pedantic(
+        grid_cg.construct_rest_of_worlds,
+        args=(excluded(grid_cg),),
+        kwargs={"simplify": False, "processes": processes},
+        setup=lambda: setattr(grid_cg, "_union_tree", None),
+        rounds=3,
+    )
+
+
+def test_locate_points(benchmark, grid_cg):
+    np = pytest.importorskip("numpy")
+    coordinates = np.random.default_rng(42).uniform((0, 0), (40, 20), (100_000, 2))
+    grid_cg.face_locator()
+    benchmark(grid_cg.locate_points, coordinates)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_decompose(benchmark, grid_cg, processes):
+    pytest.importorskip("numpy")
+    import shapely
+
+    # Circles of different sizes around the grid, each covering parts of many faces
+    geoms = {
+        "region-{}".format(i): shapely.Point(i % 40, i % 20).buffer(1 + i % 5)
+        for i in range(200)
+    }
+    grid_cg.face_locator()
+    benchmark.pedantic(
+        grid_cg.decompose, args=(geoms,), kwargs={"processes": processes}, rounds=3
+    )
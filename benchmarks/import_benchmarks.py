@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+
+def run(code: str) -> None:
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_python_startup(benchmark):
+    """Baseline for the benchmarks below: interpreter startup without the package."""
+    benchmark.pedantic(run, args=("pass",), rounds=10, warmup_rounds=1)
+
+
+def test_import(benchmark):
+    benchmark.pedantic(
+        run, args=("import constructive_geometries",), rounds=10, warmup_rounds=1
+    )
+
+
+def test_import_and_load_definitions(benchmark):
+    code = """
+from constructive_geometries import ConstructiveGeometries, Geomatcher
+ConstructiveGeometries(lazy_check=True).data["IE"]
+Geomatcher()["DE"]
+"""
+    benchmark.pedantic(run, args=(code,), rounds=10, warmup_rounds=1)
@@ -1,5 +1,6 @@
 __all__ = (
     "ConstructiveGeometries",
+    "FrozenGeomatcher",
     "Geomatcher",
     "resolved_row",
 )
@@ -7,4 +8,4 @@ __version__ = "0.9.4"
 
 
 from .cg import ConstructiveGeometries
-from .geomatcher import Geomatcher, resolved_row
+from .geomatcher import FrozenGeomatcher, Geomatcher, resolved_row
@@ -0,0 +1,185 @@
+from collections.abc import Iterable, MutableSet, Set
+
+
+class FaceIndex:
+    """Dense, append-only mapping of topological face ids to bit positions.
+
+    All ``FaceBitset`` instances of one ``Geomatcher`` share a single ``FaceIndex``, so that set operations between them reduce to integer operations on their bitmaps. Unknown face ids are given the next free position when they are first encoded."""
+
+    def __init__(self, faces: Iterable = ()):
+        # Duplicates keep the position of their first occurrence, as with ``add``
+        self.faces = list(dict.fromkeys(faces))
+        self.positions = {face: i for i, face in enumerate(self.faces)}
+
+    def __len__(self) -> int:
+        return len(self.faces)
+
+    def __contains__(self, face) -> bool:
+        return face in self.positions
+
+    def add(self, face) -> int:
+        """Return bit position of ``face``, adding it to the index if needed."""
+        try:
+            return self.positions[face]
+        except KeyError:
+            self.positions[face] = position = len(self.faces)
+            self.faces.append(face)
+            return position
+
+    def encode(self, faces: Iterable) -> int:
+        """Encode an iterable of face ids into an integer bitmap."""
+        positions = [self.add(face) for face in faces]
+        if not positions:
+            return 0
+        buffer = bytearray(max(positions) // 8 + 1)
+        for position in positions:
+            buffer[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(buffer, "little")
+
+    def decode(self, bits: int) -> Iterable:
+        """Yield the face ids set in the integer bitmap ``bits``."""
+        faces = self.faces
+        for offset, byte in enumerate(
+            bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+        ):
+            while byte:
+                low = byte & -byte
+                yield faces[offset * 8 + low.bit_length() - 1]
+                byte ^= low
+
+
+class FaceBitset(MutableSet):
+    """Mutable set of face ids stored as a Python integer bitmap over a shared ``FaceIndex``.
+
+    Behaves like a ``set`` for the operations used by ``Geomatcher``; intersections, unions, and subset tests against another ``FaceBitset`` with the same index are computed with integer AND/OR and ``int.bit_count``. Operations with other iterables first encode them into the shared index."""
+
+    __slots__ = ("bits", "index")
+
+    def __init__(self, faces: Iterable = (), index: FaceIndex | None = None):
+        self.index = FaceIndex() if index is None else index
+        self.bits = self.index.encode(faces)
+
+    @classmethod
+    def from_bits(cls, bits: int, index: FaceIndex) -> "FaceBitset":
+        obj = cls.__new__(cls)
+        obj.index, obj.bits = index, bits
+        return obj
+
+    @classmethod
+    def _from_iterable(cls, iterable: Iterable) -> set:
+        # Used by the ``Set`` mixins when mixing with foreign types; no index available
+        return set(iterable)
+
+    def _bits(self, other: Iterable) -> int:
+        if isinstance(other, FaceBitset) and other.index is self.index:
+            return other.bits
+        return self.index.encode(other)
+
+    def __contains__(self, face) -> bool:
+        try:
+            return bool(self.bits >> self.index.positions[face] & 1)
+        except (KeyError, TypeError):
+            return False
+
+    def __iter__(self) -> Iterable:
+        return self.index.decode(self.bits)
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def __bool__(self) -> bool:
+        return bool(self.bits)
+
+    def __repr__(self) -> str:
+        return "FaceBitset({})".format(sorted(self, key=str))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Set):
+            return NotImplemented
+        return len(self) == len(other) and self.bits == self._bits(other)
+
+    def __le__(self, other) -> bool:
+        if not isinstance(other, Set):
+            return NotImplemented
+        return self.issubset(other)
+
+    def __ge__(self, other) -> bool:
+        if not isinstance(other, Set):
+            return NotImplemented
+        return self.issuperset(other)
+
+    def __lt__(self, other) -> bool:
+        if not isinstance(other, Set):
+            return NotImplemented
+        return self.issubset(other) and len(self) < len(other)
+
+    def __gt__(self, other) -> bool:
+        if not isinstance(other, Set):
+            return NotImplemented
+        return self.issuperset(other) and len(self) > len(other)
+
+    def __and__(self, other: Iterable) -> "FaceBitset":
+        return self.intersection(other)
+
+    def __or__(self, other: Iterable) -> "FaceBitset":
+        return self.union(other)
+
+    def __sub__(self, other: Iterable) -> "FaceBitset":
+        return self.difference(other)
+
+    def __xor__(self, other: Iterable) -> "FaceBitset":
+        return self.from_bits(self.bits ^ self._bits(other), self.index)
+
+    __rand__ = __and__
+    __ror__ = __or__
+
+    def add(self, face) -> None:
+        self.bits |= 1 << self.index.add(face)
+
+    def discard(self, face) -> None:
+        position = self.index.positions.get(face)
+        if position is not None:
+            self.bits &= ~(1 << position)
+
+    def copy(self) -> "FaceBitset":
+        return self.from_bits(self.bits, self.index)
+
+    def intersection(self, *others: Iterable) -> "FaceBitset":
+        bits = self.bits
+        for other in others:
+            bits &= self._bits(other)
+        return self.from_bits(bits, self.index)
+
+    def union(self, *others: Iterable) -> "FaceBitset":
+        bits = self.bits
+        for other in others:
+            bits |= self._bits(other)
+        return self.from_bits(bits, self.index)
+
+    def difference(self, *others: Iterable) -> "FaceBitset":
+        bits = self.bits
+        for other in others:
+            bits &= ~self._bits(other)
+        return self.from_bits(bits, self.index)
+
+    def update(self, *others: Iterable) -> None:
+        for other in others:
+            self.bits |= self._bits(other)
+
+    def difference_update(self, *others: Iterable) -> None:
+        for other in others:
+            self.bits &= ~self._bits(other)
+
+    def intersection_update(self, *others: Iterable) -> None:
+        for other in others:
+            self.bits &= self._bits(other)
+
+    def isdisjoint(self, other: Iterable) -> bool:
+        return not self.bits & self._bits(other)
+
+    def issubset(self, other: Iterable) -> bool:
+        return not self.bits & ~self._bits(other)
+
+    def issuperset(self, other: Iterable) -> bool:
+        bits = self._bits(other)
+        return not bits & ~self.bits
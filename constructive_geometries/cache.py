@@ -0,0 +1,109 @@
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable
+
+# ``last_access`` is a logical clock, so that LRU order doesn't depend on timer resolution
+CLOCK = "(SELECT COALESCE(MAX(last_access), 0) + 1 FROM geometries)"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geometries (
+    key TEXT PRIMARY KEY,
+    wkb BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS last_access_index ON geometries (last_access);
+"""
+
+
+class GeometryCache:
+    """Persistent, content-addressed store of constructed geometries.
+
+    Geometries are stored as WKB in a SQLite database at ``fp``, keyed on the SHA 256 hash of the faces file they were built from and their sorted face ids. When the stored WKB exceeds ``max_size`` bytes, the least recently used geometries are removed.
+
+    Cache hits and misses since instantiation are available from ``report``."""
+
+    def __init__(self, fp: Path, max_size: int = 2**30):
+        self.fp = Path(fp)
+        self.max_size = max_size
+        self.hits = self.misses = 0
+        self.fp.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.fp, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def key(face_ids: Iterable[int], faces_hash: str) -> str:
+        """Cache key for the union of ``face_ids`` from the faces file with hash ``faces_hash``."""
+        hasher = hashlib.sha256(faces_hash.encode("utf-8"))
+        hasher.update(",".join(str(x) for x in sorted(face_ids)).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        """Return the WKB stored for ``key``, or ``None``."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT wkb FROM geometries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute(
+                "UPDATE geometries SET last_access = {} WHERE key = ?".format(CLOCK),
+                (key,),
+            )
+        self.hits += 1
+        return row[0]
+
+    def set(self, key: str, wkb: bytes) -> None:
+        """Store ``wkb`` under ``key``, then evict old geometries if needed."""
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO geometries VALUES (?, ?, ?, {})".format(CLOCK),
+                (key, wkb, len(wkb)),
+            )
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        (total,) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM geometries"
+        ).fetchone()
+        if total <= self.max_size:
+            return
+        rows = connection.execute(
+            "SELECT key, size FROM geometries ORDER BY last_access"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            evicted.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM geometries WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        """Remove all stored geometries."""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM geometries")
+
+    def report(self) -> dict:
+        """Hits and misses since instantiation, and number and total size of stored geometries."""
+        with self._connect() as connection:
+            entries, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM geometries"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size": size,
+        }
@@ -1,28 +1,125 @@
+import argparse
+import json
+from collections import deque
+from multiprocessing import Pool, cpu_count
 from pathlib import Path
+from typing import Iterable, Iterator
+
+import fiona
+import shapely
 from pyproj import Geod
 from shapely.geometry import shape
-import fiona
-import json
 
-DATA_DIR = Path(__file__).parent.resolve() / "data"
+from .geomatcher import load_face_areas
+from .packed import DATA_DIR, write_packed_areas
 
+CHUNK_SIZE = 256
+# Chunks per worker process which are read and not yet returned
+CHUNKS_IN_FLIGHT = 2
 
-def calculate_face_areas():
-    # Stolen from https://stackoverflow.com/a/64165076/164864
-    areas = {}
-    geod = Geod(ellps="WGS84")
+# Created once per process by ``_chunk_areas``
+_GEOD = None
+
+
+def _chunk_areas(chunk: list[tuple[int, bytes]]) -> list[tuple[int, float]]:
+    """Geodesic areas (in square meters) of a chunk of ``(face id, WKB)`` pairs."""
+    global _GEOD
+    if _GEOD is None:
+        # Stolen from https://stackoverflow.com/a/64165076/164864
+        _GEOD = Geod(ellps="WGS84")
+    geoms = shapely.from_wkb([wkb for _, wkb in chunk])
+    return [
+        (face, abs(_GEOD.geometry_area_perimeter(geom)[0]))
+        for (face, _), geom in zip(chunk, geoms)
+    ]
 
+
+def read_face_chunks(
+    fp: Path,
+    skip: Iterable[int] = (),
+    seen: set | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[list[tuple[int, bytes]]]:
+    """Stream the faces GeoPackage ``fp`` as chunks of ``chunk_size`` ``(face id, WKB)`` pairs.
+
+    Faces in ``skip`` are left out. The ids of all faces read, including skipped ones, are added to ``seen``."""
+    skip = set(skip)
+    chunk = []
     with fiona.Env():
-        with fiona.open(DATA_DIR / "faces.gpkg") as src:
+        with fiona.open(fp) as src:
             for feat in src:
-                polygon = shape(feat.geometry)
-                areas[feat.properties["id"]] = abs(
-                    geod.geometry_area_perimeter(polygon)[0]
-                )
+                face = int(feat["properties"]["id"])
+                if seen is not None:
+                    seen.add(face)
+                if face in skip:
+                    continue
+                geom = shape(feat["geometry"])
+                chunk.append((face, shapely.to_wkb(geom)))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+def calculate_face_areas(
+    fp: Path = DATA_DIR / "faces.gpkg",
+    json_fp: Path = DATA_DIR / "areas.json",
+    packed_fp: Path | None = DATA_DIR / "areas.bin",
+    incremental: bool = False,
+    changed: Iterable[int] = (),
+    processes: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict[int, float]:
+    """Calculate the geodesic areas of the faces in ``fp``, and write them to ``json_fp`` and, in the packed binary format, to ``packed_fp``.
+
+    * ``incremental``: Reuse the areas in an existing ``json_fp`` for faces which are still in ``fp``, and only calculate areas of new faces and of faces in ``changed``. Faces no longer in ``fp`` are dropped.
+    * ``changed``: Face ids whose geometry changed, e.g. after editing the faces file by hand. Only used if ``incremental``.
+    * ``processes``: Number of worker processes. Default is the number of CPUs minus one; ``1`` calculates areas in this process.
+    * ``chunk_size``: Number of faces sent to a worker at once.
+
+    Faces are streamed from ``fp`` to the workers, and the next chunk is only read once fewer than ``CHUNKS_IN_FLIGHT`` chunks per worker are waiting or being calculated, so only a few chunks of geometries are kept in memory. Returns ``{face id: area}``, sorted by face id."""
+    previous = {}
+    if incremental and Path(json_fp).exists():
+        previous = load_face_areas(json_fp)
+        for face in changed:
+            previous.pop(face, None)
+    if processes is None:
+        processes = max(cpu_count() - 1, 1)
+
+    seen = set()
+    chunks = read_face_chunks(fp, previous, seen, chunk_size)
+    areas = {}
+    if processes > 1:
+        # ``imap_unordered`` would read all chunks at once, as fast as possible
+        pending = deque()
+        with Pool(processes) as pool:
+            for chunk in chunks:
+                if len(pending) >= processes * CHUNKS_IN_FLIGHT:
+                    areas.update(pending.popleft().get())
+                pending.append(pool.apply_async(_chunk_areas, (chunk,)))
+            while pending:
+                areas.update(pending.popleft().get())
+    else:
+        for chunk in chunks:
+            areas.update(_chunk_areas(chunk))
+    areas.update((face, area) for face, area in previous.items() if face in seen)
+    areas = {face: areas[face] for face in sorted(areas)}
 
-    with open(DATA_DIR / "areas.json", "w") as f:
+    with open(json_fp, "w", encoding="utf-8") as f:
         json.dump(areas, f, indent=2)
+    if packed_fp is not None:
+        write_packed_areas(packed_fp, areas)
+    return areas
 
 
 if __name__ == "__main__":
-    calculate_face_areas()
+    parser = argparse.ArgumentParser(description="Calculate face areas")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only calculate areas of faces not in the existing areas.json",
+    )
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+    calculate_face_areas(incremental=args.incremental, processes=args.processes)
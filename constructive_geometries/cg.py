@@ -1,29 +1,33 @@
+from __future__ import annotations
+
 import hashlib
 import itertools
 import json
 import os
+from collections.abc import Mapping
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
 from functools import reduce
 from multiprocessing import Pool, cpu_count
 from pathlib import Path
-from typing import Iterable
+from typing import TYPE_CHECKING, Iterable
 from warnings import warn
 
 import wrapt
 
+from .cache import GeometryCache
 from .compatibility import COMPATIBILITY, EMPTY
+from .lazy import LazyModule, available
+from .packed import PackedTopology
+from .writers import write_geometries
 
-try:
-    import fiona
-    from shapely import Geometry
-    from shapely.geometry import mapping, shape
-    from shapely.ops import unary_union
-
-    gis = True
-except ImportError:
-    gis = False
+# Imported on first use; see ``LazyModule``
+fiona = LazyModule("fiona")
+np = LazyModule("numpy")
+shapely = LazyModule("shapely")
+gis = available("fiona", "shapely")
 
-    class Geometry:
-        pass
+if TYPE_CHECKING:
+    from shapely import Geometry
 
 
 MISSING_GIS = (
@@ -41,65 +45,521 @@ def has_gis(wrapped, instance, args, kwargs):
 
 
 DATA_FILEPATH = Path(__file__).parent.resolve() / "data"
+# Default tolerance (in degrees) of ``construct_rest_of_worlds(simplify=True)``
+SIMPLIFY_TOLERANCE = 0.05
 
 
 def sha256(filepath: Path, blocksize: int = 65536) -> str:
     """Generate SHA 256 hash for file at `filepath`"""
     hasher = hashlib.sha256()
-    fo = open(filepath, "rb")
-    buf = fo.read(blocksize)
-    while len(buf) > 0:
-        hasher.update(buf)
+    with open(filepath, "rb") as fo:
         buf = fo.read(blocksize)
+        while len(buf) > 0:
+            hasher.update(buf)
+            buf = fo.read(blocksize)
     return hasher.hexdigest()
 
 
+def cache_dir() -> Path:
+    """Directory for persistent caches. Uses ``$CONSTRUCTIVE_GEOMETRIES_CACHE`` if set, otherwise ``constructive_geometries`` in the user cache directory."""
+    if os.environ.get("CONSTRUCTIVE_GEOMETRIES_CACHE"):
+        return Path(os.environ["CONSTRUCTIVE_GEOMETRIES_CACHE"])
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "constructive_geometries"
+
+
+_HASHES = {}
+
+
+def _hash_cache_fp() -> Path:
+    return cache_dir() / "hashes.json"
+
+
+def _read_hash_cache() -> dict:
+    try:
+        with open(_hash_cache_fp(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_hash_cache(key: str, record: list) -> None:
+    # Best effort; a read-only or missing cache only means hashing again
+    try:
+        records = _read_hash_cache()
+        records[key] = record
+        fp = _hash_cache_fp()
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        tmp = fp.with_name("{}.{}.tmp".format(fp.name, os.getpid()))
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        os.replace(tmp, fp)
+    except OSError:
+        pass
+
+
+def cached_sha256(filepath: Path) -> str:
+    """SHA 256 hash for file at ``filepath``, reusing a previous result if the file path, size, and modification time are unchanged.
+
+    Results are kept in memory and in ``hashes.json`` in ``cache_dir()``, so they are shared between processes and runs."""
+    filepath = Path(filepath).resolve()
+    stat = filepath.stat()
+    key, fingerprint = str(filepath), [stat.st_size, stat.st_mtime_ns]
+
+    record = _HASHES.get(key) or _read_hash_cache().get(key)
+    if record and record[:2] == fingerprint:
+        _HASHES[key] = record
+        return record[2]
+
+    record = fingerprint + [sha256(filepath)]
+    _HASHES[key] = record
+    _write_hash_cache(key, record)
+    return record[2]
+
+
 @has_gis
 def _to_shapely(data: dict) -> Geometry:
-    return shape(data["geometry"])
+    return shapely.geometry.shape(data["geometry"])
 
 
-@has_gis
-def _to_fiona(data: Geometry) -> dict:
-    return mapping(data)
+class FaceGeometries:
+    """Geometries of topological faces, read from a faces GeoPackage in a single pass.
 
+    Geometries are kept as WKB, keyed by face id, and only decoded to shapely geometries when first needed. If ``ids`` is given, only these faces are read, using an attribute filter.
+
+    ``pack`` and ``from_packed`` convert the store to and from one contiguous WKB buffer, which is cheap to send to worker processes."""
+
+    def __init__(self, fp: Path | None = None, ids: Iterable[int] | None = None):
+        self.wkb = {}
+        self._decoded = {}
+        if fp is not None:
+            self._read(fp, ids)
+
+    def _read(self, fp: Path, ids: Iterable[int] | None) -> None:
+        with fiona.Env():
+            with fiona.open(fp) as src:
+                if ids is None:
+                    features = iter(src)
+                else:
+                    where = '"id" IN ({})'.format(",".join(str(int(i)) for i in ids))
+                    features = src.filter(where=where)
+                for feat in features:
+                    self.wkb[int(feat["properties"]["id"])] = shapely.to_wkb(
+                        _to_shapely(feat)
+                    )
+
+    def __len__(self) -> int:
+        return len(self.wkb)
+
+    def __contains__(self, face_id: int) -> bool:
+        return face_id in self.wkb
+
+    def geometries(self, ids: Iterable[int]) -> list[Geometry]:
+        """Shapely geometries for face ``ids``. Ids not in the store are ignored."""
+        ids = [i for i in ids if i in self.wkb]
+        missing = [i for i in ids if i not in self._decoded]
+        if missing:
+            decoded = shapely.from_wkb([bytes(self.wkb[i]) for i in missing])
+            self._decoded.update(zip(missing, decoded))
+        return [self._decoded[i] for i in ids]
+
+    def union(self, ids: Iterable[int]) -> Geometry:
+        """Union of the geometries of face ``ids``."""
+        return shapely.unary_union(self.geometries(ids))
+
+    def pack(self) -> tuple[list[int], list[int], bytes]:
+        """Return ``(ids, offsets, buffer)`` with all WKB geometries concatenated in ``buffer``."""
+        ids, offsets, parts = [], [0], []
+        for face_id, wkb in self.wkb.items():
+            ids.append(face_id)
+            parts.append(wkb)
+            offsets.append(offsets[-1] + len(wkb))
+        return ids, offsets, b"".join(parts)
+
+    @classmethod
+    def from_packed(
+        cls, ids: list[int], offsets: list[int], buffer: bytes
+    ) -> "FaceGeometries":
+        obj = cls()
+        view = memoryview(buffer)
+        obj.wkb = {
+            face_id: view[start:end]
+            for face_id, start, end in zip(ids, offsets, offsets[1:])
+        }
+        return obj
+
+    def simplified(self, tolerance: float) -> "FaceGeometries":
+        """Copy with all faces simplified together as a polygon coverage, with ``tolerance`` in degrees.
+
+        Edges shared by neighbouring faces are simplified in the same way, so simplification doesn't create gaps or overlaps between faces. Needs shapely 2.1 or later."""
+        if not hasattr(shapely, "coverage_simplify"):
+            raise ImportError("Simplifying faces needs shapely 2.1 or later")
+        ids = list(self.wkb)
+        geoms = shapely.coverage_simplify(self.geometries(ids), tolerance)
+        obj = FaceGeometries()
+        obj.wkb = dict(zip(ids, shapely.to_wkb(geoms)))
+        return obj
+
+
+class UnionTree:
+    """Balanced binary tree over an ordering of face ids, caching the union of each subtree.
+
+    The union of a set of faces is assembled from the cached unions of the largest subtrees which are completely included, plus the remaining single faces. Geometries which differ by a few excluded locations therefore share almost all of their work. ``order`` should put faces which are usually included or excluded together next to each other; see ``ConstructiveGeometries.face_order``."""
+
+    def __init__(self, faces: FaceGeometries, order: list[int]):
+        self.faces = faces
+        self.order = [face_id for face_id in order if face_id in faces]
+        self._cache = {}
+
+    def _node(self, start: int, end: int) -> Geometry:
+        if end - start == 1:
+            return self.faces.geometries([self.order[start]])[0]
+        try:
+            return self._cache[(start, end)]
+        except KeyError:
+            middle = (start + end) // 2
+            geom = shapely.unary_union(
+                [self._node(start, middle), self._node(middle, end)]
+            )
+            self._cache[(start, end)] = geom
+            return geom
+
+    def _pieces(self, start: int, end: int, counts: list[int], pieces: list) -> None:
+        included = counts[end] - counts[start]
+        if not included:
+            return
+        elif included == end - start:
+            pieces.append(self._node(start, end))
+        else:
+            middle = (start + end) // 2
+            self._pieces(start, middle, counts, pieces)
+            self._pieces(middle, end, counts, pieces)
+
+    def union(self, ids: Iterable[int]) -> Geometry:
+        """Union of the geometries of face ``ids``. Ids not in the tree are ignored."""
+        ids = set(ids)
+        counts = [0]
+        for face_id in self.order:
+            counts.append(counts[-1] + (face_id in ids))
+        pieces = []
+        if self.order:
+            self._pieces(0, len(self.order), counts, pieces)
+        return shapely.unary_union(pieces)
+
+
+class FaceLocator:
+    """Find the faces containing points, using an ``STRtree`` over prepared face geometries. Needs numpy."""
+
+    def __init__(self, faces: FaceGeometries):
+        # Sorted, so that points on edges between faces get the lowest face id
+        self.ids = np.array(sorted(faces.wkb), dtype=np.int64)
+        self.geometries = np.array(faces.geometries(self.ids.tolist()), dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+        self.areas = shapely.area(self.geometries)
+
+    def locate(self, coordinates) -> np.ndarray:
+        """Face ids of the faces containing the points ``coordinates``, an array of shape ``(n, 2)`` of longitudes and latitudes.
+
+        Returns an integer array of length ``n``. Points on the edge between faces get the lowest face id, and points outside all faces get ``-1``."""
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        points = shapely.points(coordinates)
+        # The tree only compares bounding boxes; the exact test uses the prepared faces
+        point_index, face_index = self.tree.query(points)
+        covered = shapely.covers(self.geometries[face_index], points[point_index])
+        positions = np.full(len(points), len(self.ids), dtype=np.int64)
+        np.minimum.at(positions, point_index[covered], face_index[covered])
+        ids = np.append(self.ids, -1)
+        return ids[positions]
+
+    def covered(self, geom: Geometry, threshold: float = 0.5) -> set[int]:
+        """Ids of the faces of which at least ``threshold`` of the area is covered by ``geom``. With ``threshold=0``, all faces which overlap ``geom`` are included.
+
+        Covered fractions are computed in longitude and latitude; within a single face, they are close to the fractions of geodesic areas."""
+        shapely.prepare(geom)
+        candidates = self.tree.query(geom, predicate="intersects")
+        # Faces completely inside ``geom`` don't need an intersection
+        fractions = np.ones(len(candidates))
+        partial = ~shapely.covers(geom, self.geometries[candidates])
+        candidate_areas = self.areas[candidates[partial]]
+        fractions[partial] = np.divide(
+            shapely.area(
+                shapely.intersection(self.geometries[candidates[partial]], geom)
+            ),
+            candidate_areas,
+            out=np.zeros(len(candidate_areas)),
+            where=candidate_areas > 0,
+        )
+        keep = (fractions >= threshold) & (fractions > 0)
+        return set(self.ids[candidates[keep]].tolist())
+
+
+# Face geometries shared by all tasks in a worker process; see ``_init_worker``
+_WORKER_TREE = None
+
+
+def _init_worker(packed: tuple, order: list[int]) -> None:
+    global _WORKER_TREE
+    _WORKER_TREE = UnionTree(FaceGeometries.from_packed(*packed), order)
+
+
+# Face locator in a worker process; see ``_init_locator_worker``
+_WORKER_LOCATOR = None
+
+
+def _init_locator_worker(packed: tuple) -> None:
+    global _WORKER_LOCATOR
+    _WORKER_LOCATOR = FaceLocator(FaceGeometries.from_packed(*packed))
+
+
+def _covered_worker(args: tuple[str, bytes, float]) -> tuple[str, set[int]]:
+    label, wkb, threshold = args
+    return label, _WORKER_LOCATOR.covered(shapely.from_wkb(wkb), threshold)
+
+
+def _simplify(geom: Geometry, simplification: tuple[float, bool] | None) -> Geometry:
+    """Simplify ``geom`` with ``(tolerance, preserve_topology)``, unless ``simplification`` is ``None``."""
+    if simplification is None:
+        return geom
+    tolerance, preserve_topology = simplification
+    return geom.simplify(tolerance, preserve_topology=preserve_topology)
+
+
+def _union_worker(
+    args: tuple[str, Iterable[int]] | tuple[str, Iterable[int], tuple | None]
+) -> tuple[str, Geometry]:
+    """Union of the face ids of a ``(label, face ids)`` task, simplified with the optional third element ``(tolerance, preserve_topology)``."""
+    label, face_ids = args[:2]
+    simplification = args[2] if len(args) > 2 else None
+    if _WORKER_TREE is None:
+        raise RuntimeError(
+            "Worker process has no face geometries; create process pools with ``ConstructiveGeometries.process_pool``"
+        )
+    return label, _simplify(_WORKER_TREE.union(face_ids), simplification)
 
-@has_gis
-def _union(args: tuple[str, Path, list[int]]) -> tuple[str, Geometry]:
-    label, fp, face_ids = args
-    shapes = []
-    with fiona.Env():
-        with fiona.open(fp) as src:
-            for feat in src:
-                if int(feat["properties"]["id"]) in face_ids:
-                    shapes.append(_to_shapely(feat))
-    return label, unary_union(shapes)
+
+def _geometries_filepath(fp: Path) -> Path:
+    """``fp`` with ``.gpkg`` appended, unless it is already a GeoPackage or GeoParquet filepath."""
+    fp = Path(fp)
+    if fp.suffix.lower() not in (".gpkg", ".parquet"):
+        fp = fp.parent / (fp.name + ".gpkg")
+    return fp
 
 
 class ConstructiveGeometries:
-    def __init__(self, backwards_compatible: bool = False):
+    def __init__(
+        self,
+        backwards_compatible: bool = False,
+        lazy_check: bool = False,
+        geometry_cache: GeometryCache | bool = False,
+        face_tolerance: float | None = None,
+    ):
+        """Load face definitions.
+
+        * ``backwards_compatible``: Also define deprecated location names.
+        * ``lazy_check``: Don't check the faces file on instantiation, but only before the first geometry is constructed. Useful if only ``self.data`` is needed.
+        * ``geometry_cache``: A ``GeometryCache`` in which constructed geometries are stored and looked up. ``True`` uses ``geometries.sqlite`` in ``cache_dir()``.
+        * ``face_tolerance``: Simplify the face geometries once, with this tolerance in degrees, before constructing any geometry (see ``FaceGeometries.simplified``). All constructed geometries then share the same simplified boundaries, without gaps or overlaps between them, and are faster to compute.
+
+        """
+        if geometry_cache is True:
+            geometry_cache = GeometryCache(cache_dir() / "geometries.sqlite")
+        self.geometry_cache = geometry_cache or None
+        self.face_tolerance = face_tolerance
         self.data_fp = DATA_FILEPATH / "faces.json"
+        self.packed_fp = DATA_FILEPATH / "faces.bin"
         self.faces_fp = DATA_FILEPATH / "faces.gpkg"
-        self.check_data()
+        self.checked = False
+        self._face_geometries = None
+        self._union_tree = None
+        self._face_locator = None
+        if not lazy_check:
+            self.check_data()
         self.load_definitions()
         if backwards_compatible:
             self.add_backward_compatible_definitions()
 
     def check_data(self) -> None:
-        """Check that definitions file is present, and that faces file is readable."""
+        """Check that definitions file is present, and that faces file is readable.
+
+        The hash of the faces file is cached (see ``cached_sha256``), and the faces file is only opened with fiona if its hash wasn't already verified."""
         assert self.data_fp.is_file()
-        if gis:
+        key = str(self.faces_fp.resolve())
+        verified = key in _HASHES
+        gpkg_hash = self.read_metadata()["sha256"]
+        assert gpkg_hash == cached_sha256(self.faces_fp)
+
+        if gis and not verified:
             with fiona.Env():
                 with fiona.open(self.faces_fp) as src:
                     assert src.meta
+        self.checked = True
+
+    def _ensure_checked(self) -> None:
+        if not self.checked:
+            self.check_data()
+
+    @has_gis
+    def face_geometries(self) -> FaceGeometries:
+        """All face geometries, read once from ``self.faces_fp`` and then reused."""
+        if self._face_geometries is None:
+            self._ensure_checked()
+            faces = FaceGeometries(self.faces_fp)
+            if self.face_tolerance:
+                faces = faces.simplified(self.face_tolerance)
+            self._face_geometries = faces
+        return self._face_geometries
+
+    def _cache_key(
+        self, included: set, simplification: tuple[float, bool] | None = None
+    ) -> str:
+        # Simplified geometries are different geometries; unsimplified keys don't change
+        version = self.metadata["sha256"]
+        if self.face_tolerance:
+            version += ":faces={}".format(self.face_tolerance)
+        if simplification is not None:
+            version += ":simplify={},{}".format(*simplification)
+        return GeometryCache.key(included, version)
+
+    def _from_cache(
+        self, included: set, simplification: tuple[float, bool] | None = None
+    ) -> Geometry | None:
+        if self.geometry_cache is not None:
+            key = self._cache_key(included, simplification)
+            wkb = self.geometry_cache.get(key)
+            if wkb is not None:
+                return shapely.from_wkb(wkb)
+
+    def _to_cache(
+        self,
+        included: set,
+        geom: Geometry,
+        simplification: tuple[float, bool] | None = None,
+    ) -> None:
+        if self.geometry_cache is not None:
+            key = self._cache_key(included, simplification)
+            self.geometry_cache.set(key, shapely.to_wkb(geom))
+
+    def _union_faces(self, included: set) -> Geometry:
+        """Union of the geometries of face ids ``included``, using ``self.geometry_cache`` if present."""
+        geom = self._from_cache(included)
+        if geom is None:
+            geom = self.union_tree().union(included)
+            self._to_cache(included, geom)
+        return geom
+
+    def face_order(self) -> list[int]:
+        """All face ids, ordered so that faces in the same locations are next to each other.
+
+        Each face is keyed by the locations including it, from largest to smallest; sorting by these keys keeps nested locations contiguous."""
+        including = {}
+        for label in sorted(self.data, key=lambda x: (-len(self.data[x]), x)):
+            for face in self.data[label]:
+                including.setdefault(face, []).append(label)
+        return sorted(self.all_faces, key=lambda x: (including.get(x, []), x))
 
-        gpkg_hash = json.load(open(self.data_fp, encoding="utf-8"))["metadata"]["sha256"]
-        assert gpkg_hash == sha256(self.faces_fp)
+    @has_gis
+    def union_tree(self) -> UnionTree:
+        """``UnionTree`` over all face geometries, reused for all geometries constructed by this instance."""
+        if self._union_tree is None:
+            self._union_tree = UnionTree(self.face_geometries(), self.face_order())
+        return self._union_tree
+
+    @has_gis
+    def face_locator(self) -> FaceLocator:
+        """``FaceLocator`` over all face geometries, built on first use and then reused."""
+        if self._face_locator is None:
+            self._face_locator = FaceLocator(self.face_geometries())
+        return self._face_locator
+
+    @has_gis
+    def locate_points(self, coordinates) -> np.ndarray:
+        """Face ids of the faces containing points. ``coordinates`` is an array of shape ``(n, 2)`` of longitudes and latitudes; see ``FaceLocator.locate``.
+
+        Use ``Geomatcher.face_locations`` to find the locations including these faces."""
+        return self.face_locator().locate(coordinates)
+
+    @has_gis
+    def decompose(
+        self,
+        geoms: dict | Path,
+        threshold: float = 0.5,
+        field: str = "name",
+        layer: str | None = None,
+        processes: int | None = None,
+    ) -> dict[str, set[int]]:
+        """Decompose arbitrary polygons into the faces they cover, e.g. to add them as new locations with ``Geomatcher.add_definitions(..., relative=False)``.
+
+        * ``geoms``: Dictionary of ``{label: shapely geometry}``, or the filepath of a vector file which fiona can read, e.g. a GeoPackage. Coordinates must be longitude and latitude, like the faces.
+        * ``threshold``: Minimum fraction of the area of a face which must be covered for the face to be included (see ``FaceLocator.covered``).
+        * ``field``: Attribute with the labels of the features in a file.
+        * ``layer``: Layer to read from a file with several layers.
+        * ``processes``: Number of worker processes (default: one less than the number of CPUs). Geometries are decomposed in this process if there is only one process or one geometry.
+
+        Returns ``{label: set of face ids}``, in the order of ``geoms``."""
+        if not isinstance(geoms, Mapping):
+            with fiona.Env():
+                with fiona.open(geoms, layer=layer) as src:
+                    geoms = {
+                        feat["properties"][field]: _to_shapely(feat) for feat in src
+                    }
+        if processes is None:
+            processes = max(cpu_count() - 1, 1)
+
+        if processes > 1 and len(geoms) > 1:
+            tasks = [
+                (label, shapely.to_wkb(geom), threshold)
+                for label, geom in geoms.items()
+            ]
+            # Each worker builds its own tree from the face geometries, sent once
+            with Pool(
+                processes,
+                initializer=_init_locator_worker,
+                initargs=(self.face_geometries().pack(),),
+            ) as pool:
+                covered = dict(
+                    pool.imap_unordered(
+                        _covered_worker,
+                        tasks,
+                        chunksize=max(len(tasks) // (4 * processes), 1),
+                    )
+                )
+            return {label: covered[label] for label in geoms}
+        locator = self.face_locator()
+        return {
+            label: locator.covered(geom, threshold) for label, geom in geoms.items()
+        }
+
+    def read_metadata(self) -> dict:
+        """Read definitions metadata, preferably from the packed binary definitions file."""
+        if self.packed_fp.is_file():
+            return PackedTopology.open(self.packed_fp).metadata
+        return json.load(open(self.data_fp, encoding="utf-8"))["metadata"]
 
     def load_definitions(self) -> None:
-        """Load mapping of country names to face ids"""
-        self.data = dict(json.load(open(self.data_fp, encoding="utf-8"))["data"])
-        self.all_faces = set(self.data.pop("__all__"))
+        """Load mapping of country names to face ids.
+
+        Reads the packed definitions file ``faces.bin`` if present and converted from the current ``faces.json``, which is much faster than parsing ``faces.json``; ``faces.json`` is used otherwise. See ``constructive_geometries.packed``. Either way, ``self.data`` is a plain dictionary of ``{location: [face ids]}``."""
+        packed = None
+        if self.packed_fp.is_file():
+            packed = PackedTopology.open(self.packed_fp)
+            if packed.source != cached_sha256(self.data_fp):
+                warn(
+                    "{} is out of date; reading {} instead. Regenerate it with "
+                    "`python -m constructive_geometries.packed`".format(
+                        self.packed_fp.name, self.data_fp.name
+                    )
+                )
+                packed = None
+        if packed is not None:
+            self.metadata = packed.metadata
+            self.data = dict(packed)
+            self.all_faces = set(packed.all_faces)
+        else:
+            obj = json.load(open(self.data_fp, encoding="utf-8"))
+            self.metadata = obj["metadata"]
+            self.data = dict(obj["data"])
+            self.all_faces = set(self.data.pop("__all__"))
         self.locations = set(self.data.keys())
 
     def add_backward_compatible_definitions(self) -> None:
@@ -133,27 +593,107 @@ class ConstructiveGeometries:
             warn(MISSING_GIS)
             return
 
-        geom = _union(None, self.faces_fp, included)[1]
+        geom = self._union_faces(included)
         if fp:
             self.write_geoms_to_file(fp, [geom], [name] if name else None)
             return fp
         else:
             return geom
 
+    @has_gis
+    def process_pool(self, max_workers: int | None = None) -> ProcessPoolExecutor:
+        """Process pool whose workers hold all face geometries, for use as ``executor`` in ``construct_rest_of_worlds``.
+
+        Starting workers and sending them the face geometries is expensive, so reuse the pool for several calls."""
+        tree = self.union_tree()
+        return ProcessPoolExecutor(
+            max_workers,
+            initializer=_init_worker,
+            initargs=(tree.faces.pack(), tree.order),
+        )
+
+    def _compute_unions(
+        self,
+        tasks: list[tuple[str, set]],
+        use_mp: bool,
+        processes: int | None,
+        executor: Executor | None,
+        simplification: tuple[float, bool] | None = None,
+    ) -> Iterable[tuple[str, Geometry]]:
+        """Yield ``(label, geometry)`` for ``tasks`` as they are finished.
+
+        Geometries are simplified with ``(tolerance, preserve_topology)`` where they are computed, i.e. in the worker processes or threads. Parallel tasks are started largest first, so that one large geometry doesn't keep a single worker busy at the end."""
+        tree = self.union_tree()
+        if executor is not None or use_mp:
+            tasks = sorted(tasks, key=lambda task: -len(task[1]))
+        if processes is None:
+            processes = max(cpu_count() - 1, 1)
+
+        if executor is not None:
+            if isinstance(executor, ProcessPoolExecutor):
+                futures = [
+                    executor.submit(_union_worker, (label, included, simplification))
+                    for label, included in tasks
+                ]
+            else:
+                # Threads share this process' tree and its partial unions
+                futures = [
+                    executor.submit(
+                        lambda label, included: (
+                            label,
+                            _simplify(tree.union(included), simplification),
+                        ),
+                        label,
+                        included,
+                    )
+                    for label, included in tasks
+                ]
+            for future in as_completed(futures):
+                yield future.result()
+        elif use_mp and processes > 1 and len(tasks) > 1:
+            # Each worker receives the face geometries once, not once per task,
+            # and reuses partial unions between the tasks it is given
+            with Pool(
+                processes,
+                initializer=_init_worker,
+                initargs=(tree.faces.pack(), tree.order),
+            ) as pool:
+                yield from pool.imap_unordered(
+                    _union_worker,
+                    [(label, included, simplification) for label, included in tasks],
+                )
+        else:
+            for label, included in tasks:
+                yield label, _simplify(tree.union(included), simplification)
+
     @has_gis
     def construct_rest_of_worlds(
         self,
         excluded: dict[str, list],
         fp: Path | None = None,
         use_mp: bool = True,
-        simplify: bool = True,
+        simplify: bool | float = True,
+        processes: int | None = None,
+        executor: Executor | None = None,
+        preserve_topology: bool = True,
     ) -> Path | Geometry:
         """Construct many rest-of-world geometries and optionally write to filepath ``fp``.
 
         ``excluded`` must be a **dictionary** of {"rest-of-world label": ["names", "of", "excluded", "locations"]}``.
+
+        Geometries are computed in ``processes`` worker processes (default: one less than the number of CPUs), or serially if ``use_mp`` is false or there is only one process. Alternatively, pass a ``concurrent.futures`` ``executor``: a thread pool, or a process pool from ``process_pool``.
+
+        ``simplify`` is the tolerance (in degrees) to simplify each geometry with; ``True`` uses ``SIMPLIFY_TOLERANCE``, and ``False`` doesn't simplify. Geometries are simplified in the workers, and with ``preserve_topology`` (see ``shapely.simplify``) they stay valid. Simplifying each geometry on its own can move boundaries shared by several rest-of-world geometries in different ways; to avoid this, simplify the faces instead (``face_tolerance``) and pass ``simplify=False``.
+
+        If ``fp`` is given, each geometry is written to a GeoPackage as soon as it is finished instead of being kept in memory, or, if ``fp`` ends with ``.parquet``, to GeoParquet (needs ``pyarrow``). Feature ids follow the sorted labels, but the order of rows in the file can differ.
         """
-        geoms = {}
-        raw_data = []
+        if simplify is False or simplify is None:
+            simplification = None
+        else:
+            tolerance = SIMPLIFY_TOLERANCE if simplify is True else float(simplify)
+            simplification = (tolerance, preserve_topology)
+
+        cached, tasks = [], []
         for key in sorted(excluded):
             locations = excluded[key]
             for location in locations:
@@ -163,21 +703,31 @@ class ConstructiveGeometries:
             included = self.all_faces.difference(
                 {face for loc in locations for face in self.data[loc]}
             )
-            raw_data.append((key, self.faces_fp, included))
-        if use_mp:
-            with Pool(cpu_count() - 1) as pool:
-                results = pool.map(_union, raw_data)
-            geoms = dict(results)
-        else:
-            geoms = dict([_union(row) for row in raw_data])
-        if simplify:
-            geoms = {k: v.simplify(0.05) for k, v in geoms.items()}
+            geom = self._from_cache(included, simplification)
+            if geom is None:
+                tasks.append((key, included))
+            else:
+                cached.append((key, geom))
+
+        def finished():
+            yield from cached
+            if tasks:
+                faces = dict(tasks)
+                for key, geom in self._compute_unions(
+                    tasks, use_mp, processes, executor, simplification
+                ):
+                    self._to_cache(faces[key], geom, simplification)
+                    yield key, geom
+
+        results = finished()
         if fp:
-            labels = sorted(geoms)
-            self.write_geoms_to_file(fp, [geoms[key] for key in labels], labels)
-            return fp
+            ids = {key: count for count, key in enumerate(sorted(excluded), 1)}
+            return write_geometries(
+                _geometries_filepath(fp),
+                ((key, ids[key], geom) for key, geom in results),
+            )
         else:
-            return geoms
+            return dict(results)
 
     def construct_rest_of_worlds_mapping(
         self, excluded: dict[str, list], fp: Path | None = None
@@ -205,7 +755,7 @@ class ConstructiveGeometries:
         metadata = {
             "filename": "faces.gpkg",
             "field": "id",
-            "sha256": sha256(self.faces_fp),
+            "sha256": cached_sha256(self.faces_fp),
         }
         data = []
         for key, locations in excluded.items():
@@ -241,7 +791,7 @@ class ConstructiveGeometries:
         included = set(self.data[parent]).difference(
             reduce(set.union, [set(self.data[loc]) for loc in excluded])
         )
-        _, geom = _union((None, self.faces_fp, included))
+        geom = self._union_faces(included)
         if fp:
             self.write_geoms_to_file(fp, [geom], [name] if name else None)
             return fp
@@ -252,35 +802,13 @@ class ConstructiveGeometries:
     def write_geoms_to_file(
         self, fp: Path, geoms: list, names: list[str] | None = None
     ) -> Path:
-        """Write unioned geometries ``geoms`` to filepath ``fp``. Optionally use ``names`` in name field."""
-        if fp.suffix.lower() != ".gpkg":
-            fp = fp.parent / (fp.name + ".gpkg")
+        """Write unioned geometries ``geoms`` to filepath ``fp``, a GeoPackage or, if ``fp`` ends with ``.parquet``, GeoParquet (needs ``pyarrow``). Optionally use ``names`` in name field."""
         if names is not None:
             assert len(geoms) == len(
                 names
             ), "Inconsistent length of geometries and names"
         else:
             names = ("Merged geometry {}".format(count) for count in itertools.count())
-        meta = {
-            "crs": {
-                "no_defs": True,
-                "ellps": "WGS84",
-                "datum": "WGS84",
-                "proj": "longlat",
-            },
-            "driver": "GPKG",
-            "schema": {
-                "geometry": "MultiPolygon",
-                "properties": {"name": "str", "id": "int"},
-            },
-        }
-        with fiona.Env():
-            with fiona.open(fp, "w", **meta) as sink:
-                for geom, name, count in zip(geoms, names, itertools.count(1)):
-                    sink.write(
-                        {
-                            "geometry": _to_fiona(geom),
-                            "properties": {"name": name, "id": count},
-                        }
-                    )
-        return fp
+        return write_geometries(
+            _geometries_filepath(fp), zip(names, itertools.count(1), geoms)
+        )
@@ -1,11 +1,125 @@
-from collections.abc import MutableMapping
+import copy
+import json
+import threading
+from collections import ChainMap, OrderedDict, namedtuple
+from collections.abc import Mapping, MutableMapping
 from contextlib import contextmanager
-from functools import reduce
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
 from typing import Iterable
+from warnings import warn
 
-import country_converter as coco
+import wrapt
 
 from . import ConstructiveGeometries
+from .bitset import FaceBitset, FaceIndex
+from .hierarchy import BitsetHierarchy, ContainmentHierarchy, PackedHierarchy
+from .inverted import BitsetInvertedIndex, InvertedIndex, PackedInvertedIndex
+from .lazy import LazyModule, available
+from .packed import DATA_DIR, PackedTopology, pack_topology, unpack_areas
+from .row import RowHierarchy, RowIndex
+
+# Imported on first use; see ``LazyModule``
+coco = LazyModule("country_converter")
+np = LazyModule("numpy")
+sparse = LazyModule("scipy.sparse")
+arrays = available("numpy", "scipy")
+
+
+MISSING_ARRAYS = (
+    """Function not available: array libraries (numpy and scipy) not installed"""
+)
+
+
+@wrapt.decorator
+def has_arrays(wrapped, instance, args, kwargs):
+    """Skip function execution if numpy and scipy are not installed"""
+    if arrays:
+        return wrapped(*args, **kwargs)
+    else:
+        warn(MISSING_ARRAYS)
+
+
+RelationMatrices = namedtuple(
+    "RelationMatrices", ["labels", "intersections", "subsets", "supersets"]
+)
+
+
+KEY_CACHE_SIZE = 2**16
+
+
+def _rounded(values: Iterable) -> list:
+    """Round areas or area fractions to 12 significant digits.
+
+    Sums of the same faces in a different order can differ in the last digits; rounding makes equal areas compare equal."""
+    return [float("{:.12g}".format(x)) for x in values]
+
+
+class _LRUCache(OrderedDict):
+    """Thread-safe dictionary which keeps at most ``maxsize`` items, dropping the least recently used. Contents aren't pickled."""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value) -> None:
+        with self._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            if len(self) > self.maxsize:
+                self.popitem(last=False)
+
+    def __reduce__(self):
+        return (self.__class__, (self.maxsize,))
+
+
+# Results of ``country_converter`` don't depend on the topology, and are
+# shared by all instances; ``None`` records names which can't be converted
+_COUNTRY_NAMES = _LRUCache(KEY_CACHE_SIZE)
+_CONVERTER = None
+
+
+def _convert_country_names(names: list[str]) -> dict:
+    """Convert ``names`` to ISO2 codes with a single ``country_converter`` call. Results are stored in ``_COUNTRY_NAMES`` and returned as ``{name: code or None}``."""
+    global _CONVERTER
+    if _CONVERTER is None:
+        # Loading the country data is much slower than converting a name
+        _CONVERTER = coco.CountryConverter()
+    converted = _CONVERTER.convert(
+        names=list(names), to="ISO2", not_found=None, enforce_list=True
+    )
+    results = {}
+    for name, codes in zip(names, converted):
+        # Ambiguous or unknown names are never used
+        codes = [code for code in codes if code != name]
+        results[name] = _COUNTRY_NAMES[name] = codes[0] if len(codes) == 1 else None
+    return results
+
+
+def _locations(objs: Iterable) -> Iterable:
+    """Locations of ``objs``, which are either locations or datasets with a ``location`` key."""
+    for elem in objs:
+        try:
+            yield elem["location"]
+        except TypeError:
+            yield elem
+
+
+def load_face_areas(fp: Path = DATA_DIR / "areas.bin") -> dict[int, float]:
+    """Load the geodesic areas of topological faces (in square meters) written by ``calculate_areas.calculate_face_areas``, either from the packed binary file (``.bin``) or from JSON."""
+    if Path(fp).suffix == ".bin":
+        with open(fp, "rb") as f:
+            return unpack_areas(f.read())
+    with open(fp, encoding="utf-8") as f:
+        return {int(face): area for face, area in json.load(f).items()}
 
 
 class Geomatcher(MutableMapping):
@@ -31,11 +145,15 @@ class Geomatcher(MutableMapping):
         * Splitting faces to allow for finer-scale regionalization
         * Intersection, contained, and within calculations with several configuration options.
 
+    Change locations through ``geomatcher[key] = faces``, ``del geomatcher[key]``, ``add_definitions``, and ``split_faces``, which keep the cached indices up to date. Face sets returned by ``geomatcher[key]`` must not be changed in place; after changing ``self.topology`` directly, call ``invalidate``.
+
     Initialization arguments:
 
         * ``topology``: A dictionary of ``{str: set}`` labels to faces ids. Default is ``ecoinvent``, which loads the world and ecoinvent definitions from ``constructive_geometries``.
         * ``default_namespace``: String defining the default search namespace. Default is ``'ecoinvent'``.
         * ``use_coco``: Boolean, default ``True``. Use the `country_converter <https://github.com/konstantinstadler/country_converter>`__ library to fuzzy match country identifiers, e.g. "Austria" instead of "AT".
+        * ``use_bitsets``: Boolean, default ``False``. Store face sets as ``FaceBitset`` integer bitmaps over a shared ``FaceIndex`` instead of Python sets. Values still behave like sets, but use much less memory, and intersection and subset tests become integer operations. The containment hierarchy and inverted index then also store bitmaps (see ``BitsetHierarchy`` and ``BitsetInvertedIndex``).
+        * ``face_areas``: Dictionary of ``{face id: area}``, used by ``area``, ``overlap_fractions``, and the ``by_area`` option of ``intersects``, ``contained``, and ``within``. Default for the ``ecoinvent`` topology is the shipped ``areas.bin``, loaded on first use.
 
     """
 
@@ -47,8 +165,20 @@ class Geomatcher(MutableMapping):
         default_namespace: str | None = None,
         use_coco: bool = True,
         backwards_compatible: bool = False,
+        use_bitsets: bool = False,
+        face_areas: dict | None = None,
     ):
         self.coco = use_coco
+        self._resolved = _LRUCache(KEY_CACHE_SIZE)
+        self._max_face = None
+        self.face_index = None
+        self._face_areas = None if face_areas is None else dict(face_areas)
+        self._areas_fp = None
+        self._area_index = None
+        self._area_vector = None
+        self._relations = None
+        self._hierarchy = None
+        self._inverted = None
         if topology == "ecoinvent":
             self.default_namespace = "ecoinvent"
 
@@ -58,11 +188,15 @@ class Geomatcher(MutableMapping):
                 else:
                     return ("ecoinvent", x)
 
-            cg = ConstructiveGeometries(backwards_compatible=backwards_compatible)
+            # Only face definitions are needed; don't check the faces file
+            cg = ConstructiveGeometries(
+                backwards_compatible=backwards_compatible, lazy_check=True
+            )
             self.topology = {
                 ns(x): set(y) for x, y in cg.data.items() if x != "__all__"
             }
-            self["GLO"] = reduce(set.union, self.topology.values())
+            self._areas_fp = DATA_DIR / "areas.bin"
+            self["GLO"] = set().union(*self.topology.values())
         else:
             self.default_namespace = default_namespace
             self.topology = topology
@@ -70,7 +204,10 @@ class Geomatcher(MutableMapping):
             self.topology = {}
             self.faces = set()
         else:
-            self.faces = reduce(set.union, self.topology.values())
+            self.faces = set().union(*self.topology.values())
+        if use_bitsets:
+            self.face_index = FaceIndex(self.faces)
+            self.topology = {k: self._faceset(v) for k, v in self.topology.items()}
 
     def __contains__(self, key: str) -> bool:
         return key in self.topology
@@ -85,10 +222,14 @@ class Geomatcher(MutableMapping):
             key = self._actual_key(key)
         except KeyError:
             pass
-        self.topology[key] = value
+        old = self.topology.get(key)
+        self.topology[key] = self._faceset(value)
+        self._location_changed(key, old)
 
     def __delitem__(self, key) -> None:
-        del self.topology[self._actual_key(key)]
+        key = self._actual_key(key)
+        old = self.topology.pop(key)
+        self._location_changed(key, old)
 
     def __len__(self) -> int:
         return len(self.topology)
@@ -96,22 +237,229 @@ class Geomatcher(MutableMapping):
     def __iter__(self) -> Iterable[str]:
         return iter(self.topology)
 
-    def _actual_key(self, key: str | tuple) -> str | tuple:
-        """Translate provided key into the key used in the topology. Tries the unmodified key, the key with the default namespace, and the country converter. Raises a ``KeyError`` if none of these finds a suitable definition in ``self.topology``."""
+    def invalidate(self) -> None:
+        """Drop all cached results which depend on ``self.topology``.
+
+        Methods of this class keep the indices up to date as they change the topology. Changes made directly to ``self.topology``, or to a face set in place, bypass them and must be followed by a call to this method."""
+        self._relations = None
+        self._hierarchy = None
+        self._inverted = None
+        self._resolved.clear()
+
+    def _location_changed(self, key: str | tuple, old: Iterable | None = None) -> None:
+        """Update cached results after ``key`` was added, changed, or removed. ``old`` are the previous faces of ``key``, if any."""
+        self._relations = None
+        new = self.topology.get(key)
+        if key == "RoW":
+            # ``RoW`` isn't part of the shared indices; see ``hierarchy``
+            return
+        if old is None or new is None:
+            # Key resolution only depends on which locations exist
+            self._resolved.clear()
+        if self._hierarchy is not None:
+            if new is None:
+                self._hierarchy.remove(key)
+            else:
+                self._hierarchy.add(key, new)
+        if self._inverted is not None:
+            if new is None:
+                self._inverted.remove(key, old)
+            elif old is None:
+                self._inverted.add(key, new)
+            else:
+                self._inverted.replace(key, old, new)
+
+    def _indexed(self) -> Mapping:
+        """``self.topology`` without ``RoW``, which is kept out of the shared indices."""
+        if "RoW" not in self.topology:
+            return self.topology
+        return {key: value for key, value in self.topology.items() if key != "RoW"}
+
+    def _base_hierarchy(self) -> ContainmentHierarchy:
+        if self._hierarchy is None:
+            if self.face_index is None:
+                self._hierarchy = ContainmentHierarchy(self._indexed())
+            else:
+                self._hierarchy = BitsetHierarchy(self._indexed(), self.face_index)
+        return self._hierarchy
+
+    def _base_inverted(self) -> InvertedIndex:
+        if self._inverted is None:
+            if self.face_index is None:
+                self._inverted = InvertedIndex(self._indexed())
+            else:
+                self._inverted = BitsetInvertedIndex(self._indexed())
+        return self._inverted
+
+    @property
+    def hierarchy(self) -> ContainmentHierarchy | RowHierarchy:
+        """``ContainmentHierarchy`` of the current topology, built on first use and then kept up to date.
+
+        ``RoW`` is usually defined for a single query and removed again (see ``resolved_row``), and inserting a large ``RoW`` into the hierarchy is expensive. It is therefore never stored in the hierarchy; if ``RoW`` is defined, its relations are computed on demand by a ``RowHierarchy`` overlay, as in ``with_row``."""
+        if "RoW" in self.topology:
+            return RowHierarchy(
+                self._base_hierarchy(), self.topology, self.topology["RoW"]
+            )
+        return self._base_hierarchy()
+
+    @property
+    def inverted_index(self) -> InvertedIndex | RowIndex:
+        """``InvertedIndex`` from face ids to locations, built on first use and then kept up to date. Like ``hierarchy``, uses an overlay for ``RoW``."""
+        if "RoW" in self.topology:
+            return RowIndex(self._base_inverted(), self.topology["RoW"])
+        return self._base_inverted()
+
+    @property
+    def face_areas(self) -> dict:
+        """Dictionary of ``{face id: area}``, loaded on first use for the ``ecoinvent`` topology."""
+        if self._face_areas is None:
+            if self._areas_fp is None:
+                raise ValueError("No face areas given for this topology")
+            self._face_areas = load_face_areas(self._areas_fp)
+        return self._face_areas
+
+    def _area_array(self) -> tuple:
+        """Return ``(index, vector)``, with face areas in a numpy array aligned with the ``FaceIndex``. Faces without known area have area zero."""
+        index = self.face_index if self.face_index is not None else self._area_index
+        if index is None:
+            index = self._area_index = FaceIndex(self.faces)
+        if self._area_vector is None or len(self._area_vector) != len(index):
+            areas = self.face_areas
+            self._area_vector = np.array(
+                [areas.get(face, 0.0) for face in index.faces], dtype=float
+            )
+        return index, self._area_vector
+
+    def _label_areas(self, labels: list, faces: Iterable | None = None):
+        """Numpy array of the areas of ``labels``, or of their intersections with ``faces`` if given."""
+        index, _ = self._area_array()
+        positions = None if faces is None else [index.add(face) for face in faces]
+        _, matrix = self._incidence_matrix(labels, index)
+        _, vector = self._area_array()
+        if positions is not None:
+            weights = np.zeros_like(vector)
+            weights[positions] = vector[positions]
+            vector = weights
+        return matrix @ vector
+
+    def _by_area(self, lst: list, faces: Iterable | None = None) -> list:
+        """Replace the face count sort keys of ``(label, sort key)`` pairs in ``lst`` with areas. If ``faces`` is given, sort keys are ``(area of intersection with faces, area)``."""
+        if not arrays:
+            warn(MISSING_ARRAYS)
+            return lst
+        labels = [k for k, _ in lst]
+        if not labels:
+            return lst
+        areas = _rounded(self._label_areas(labels))
+        if faces is None:
+            return list(zip(labels, areas))
+        return list(zip(labels, zip(_rounded(self._label_areas(labels, faces)), areas)))
+
+    def _faceset(self, faces: Iterable) -> set | FaceBitset:
+        """Convert ``faces`` to the storage type used in ``self.topology``."""
+        if self.face_index is None:
+            return faces
+        elif isinstance(faces, FaceBitset) and faces.index is self.face_index:
+            return faces
+        return FaceBitset(faces, self.face_index)
+
+    def _bits(self, faces: Iterable) -> int:
+        """Integer bitmap of ``faces`` over ``self.face_index``. Only for bitset storage."""
+        if isinstance(faces, FaceBitset) and faces.index is self.face_index:
+            return faces.bits
+        return self.face_index.encode(faces)
+
+    def _bits_items(self, possibles: dict) -> Iterable[tuple]:
+        return [(k, self._bits(v)) for k, v in possibles.items()]
+
+    def _actual_key(
+        self, key: str | tuple, country_names: dict | None = None
+    ) -> str | tuple:
+        """Translate provided key into the key used in the topology. Tries the unmodified key, the key with the default namespace, and the country converter. Raises a ``KeyError`` if none of these finds a suitable definition in ``self.topology``.
+
+        ``country_names`` are already converted ``{name: code or None}``, which are used instead of ``_COUNTRY_NAMES``. Results for keys not in the topology, including failures, are cached until locations are added or removed."""
         if key in self or key in ("RoW", "GLO"):
             return key
-        elif (self.default_namespace, key) in self:
+        cache_key = (self.default_namespace, key)
+        try:
+            found = self._resolved[cache_key]
+        except KeyError:
+            found = self._resolved[cache_key] = self._resolve(key, country_names)
+        if found is None:
+            raise KeyError("Can't find location: {}.".format(key))
+        return found
+
+    def _resolve(
+        self, key: str | tuple, country_names: dict | None = None
+    ) -> str | tuple | None:
+        if (self.default_namespace, key) in self:
             return (self.default_namespace, key)
 
         if isinstance(key, str) and self.coco:
-            new = coco.convert(names=[key], to="ISO2", not_found=None)
+            if country_names is not None and key in country_names:
+                new = country_names[key]
+            else:
+                try:
+                    new = _COUNTRY_NAMES[key]
+                except KeyError:
+                    new = _convert_country_names([key])[key]
             if new in self:
                 if new not in self.__seen:
                     self.__seen.add(key)
                     print("Geomatcher: Used '{}' for '{}'".format(new, key))
                 return new
 
-        raise KeyError("Can't find location: {}.".format(key))
+    def resolve_many(self, keys: Iterable) -> list:
+        """Translate many keys into the keys used in the topology (see ``_actual_key``). Returns a list in the order of ``keys``, with ``None`` for keys which can't be found.
+
+        All names which need the country converter are converted in a single call, so this is much faster than resolving keys one by one. Keys are resolved with the conversions of this batch, even if there are more than fit in the shared cache of country names."""
+        keys = list(keys)
+        country_names = {}
+        if self.coco:
+            names = set()
+            for key in keys:
+                if (
+                    isinstance(key, str)
+                    and key not in self
+                    and key not in ("RoW", "GLO")
+                    and (self.default_namespace, key) not in self
+                    and key not in country_names
+                ):
+                    try:
+                        country_names[key] = _COUNTRY_NAMES[key]
+                    except KeyError:
+                        names.add(key)
+            if names:
+                country_names.update(_convert_country_names(sorted(names)))
+
+        resolved = []
+        for key in keys:
+            try:
+                resolved.append(self._actual_key(key, country_names))
+            except KeyError:
+                resolved.append(None)
+        return resolved
+
+    def _exclusive(self, labels: list) -> list:
+        """Keep each location in ``labels`` whose faces don't overlap an earlier kept location.
+
+        Covered faces are accumulated once, as an integer bitmap with bitset storage and as a set otherwise, so each location is only tested and added once."""
+        remaining = []
+        if self.face_index is not None:
+            covered = 0
+            for label in labels:
+                bits = self._bits(self[label])
+                if not bits & covered:
+                    covered |= bits
+                    remaining.append(label)
+        else:
+            covered = set()
+            for label in labels:
+                faces = self[label]
+                if covered.isdisjoint(faces):
+                    covered.update(faces)
+                    remaining.append(label)
+        return remaining
 
     def _finish_filter(
         self,
@@ -135,14 +483,7 @@ class Geomatcher(MutableMapping):
         if key == "RoW" and "RoW" not in self and exclusive:
             return ["RoW"] if "RoW" in lst else []
         elif exclusive:
-            removed, remaining = set(), []
-            while lst:
-                current = lst.pop(0)
-                faces = self[current]
-                if not faces.intersection(removed):
-                    removed.update(faces)
-                    remaining.append(current)
-            lst = remaining
+            lst = self._exclusive(lst)
 
         # If RoW not resolved, make it the smallest
         if "RoW" not in self and "RoW" in lst:
@@ -157,10 +498,11 @@ class Geomatcher(MutableMapping):
         exclusive: bool = False,
         biggest_first: bool = True,
         only: Iterable | None = None,
+        by_area: bool = False,
     ) -> list:
         """Get all locations that intersect this location.
 
-        Note that sorting is done by first by number of faces intersecting ``key``; the total number of faces in the intersected region is only used to break sorting ties.
+        Note that sorting is done by first by number of faces intersecting ``key``; the total number of faces in the intersected region is only used to break sorting ties. If ``by_area``, sorting uses the area of the intersection and of the intersected region instead (see ``face_areas``).
 
         If the ``resolved_row`` context manager is not used, ``RoW`` doesn't have a spatial definition, and therefore nothing intersects it. ``.intersects("RoW")`` returns a list with with ``RoW`` or nothing.
 
@@ -171,11 +513,25 @@ class Geomatcher(MutableMapping):
             return ["RoW"] if "RoW" in possibles else []
 
         faces = self[key]
-        lst = [
-            (k, (len(v.intersection(faces)), len(v)))
-            for k, v in possibles.items()
-            if (faces.intersection(v))
-        ]
+        if only is None:
+            possibles = {
+                k: self.topology[k] for k in self.inverted_index.intersecting(faces)
+            }
+        if self.face_index is not None:
+            bits = self._bits(faces)
+            lst = [
+                (k, ((v & bits).bit_count(), v.bit_count()))
+                for k, v in self._bits_items(possibles)
+                if v & bits
+            ]
+        else:
+            lst = [
+                (k, (len(v.intersection(faces)), len(v)))
+                for k, v in possibles.items()
+                if (faces.intersection(v))
+            ]
+        if by_area:
+            lst = self._by_area(lst, faces)
         return self._finish_filter(lst, key, include_self, exclusive, biggest_first)
 
     def contained(
@@ -185,8 +541,9 @@ class Geomatcher(MutableMapping):
         exclusive: bool = False,
         biggest_first: bool = True,
         only: Iterable | None = None,
+        by_area: bool = False,
     ) -> list:
-        """Get all locations that are completely within this location.
+        """Get all locations that are completely within this location. Sorted by number of faces, or by area if ``by_area``.
 
         If the ``resolved_row`` context manager is not used, ``RoW`` doesn't have a spatial definition. Therefore, ``.contained("RoW")`` returns a list with either ``RoW`` or nothing.
 
@@ -200,7 +557,24 @@ class Geomatcher(MutableMapping):
         possibles = self.topology if only is None else {k: self[k] for k in only}
 
         faces = self[key]
-        lst = [(k, len(v)) for k, v in possibles.items() if v and faces.issuperset(v)]
+        if only is None:
+            lst = [
+                (k, len(self.topology[k]))
+                for k in self.hierarchy.contained(self._actual_key(key))
+            ]
+        elif self.face_index is not None:
+            bits = self._bits(faces)
+            lst = [
+                (k, v.bit_count())
+                for k, v in self._bits_items(possibles)
+                if v and v | bits == bits
+            ]
+        else:
+            lst = [
+                (k, len(v)) for k, v in possibles.items() if v and faces.issuperset(v)
+            ]
+        if by_area:
+            lst = self._by_area(lst)
         return self._finish_filter(lst, key, include_self, exclusive, biggest_first)
 
     def within(
@@ -210,8 +584,9 @@ class Geomatcher(MutableMapping):
         exclusive: bool = False,
         biggest_first: bool = True,
         only: Iterable | None = None,
+        by_area: bool = False,
     ) -> list:
-        """Get all locations that completely contain this location.
+        """Get all locations that completely contain this location. Sorted by number of faces, or by area if ``by_area``.
 
         If the ``resolved_row`` context manager is not used, ``RoW`` doesn't have a spatial definition. Therefore, ``RoW`` can only be contained by ``GLO`` and ``RoW``.
 
@@ -223,9 +598,42 @@ class Geomatcher(MutableMapping):
             return list(reversed(answer)) if biggest_first else answer
 
         faces = self[key]
-        lst = [(k, len(v)) for k, v in possibles.items() if faces.issubset(v)]
+        if only is None:
+            lst = [
+                (k, len(self.topology[k]))
+                for k in self.hierarchy.within(self._actual_key(key))
+            ]
+        elif self.face_index is not None:
+            bits = self._bits(faces)
+            lst = [
+                (k, v.bit_count())
+                for k, v in self._bits_items(possibles)
+                if v & bits == bits
+            ]
+        else:
+            lst = [(k, len(v)) for k, v in possibles.items() if faces.issubset(v)]
+        if by_area:
+            lst = self._by_area(lst)
         return self._finish_filter(lst, key, include_self, exclusive, biggest_first)
 
+    def face_locations(self, faces: Iterable[int], by_area: bool = False) -> list:
+        """Locations including each face id in ``faces``, most specific first.
+
+        Returns a list of lists of location keys, aligned with ``faces``. Locations are sorted by their number of faces, or by area if ``by_area``; ties keep insertion order. Face ids in no location, like ``-1`` for points outside all faces in ``ConstructiveGeometries.locate_points``, get an empty list.
+
+        Each distinct face is looked up once in the inverted index, so ``faces`` can be a large array of face ids of points; equal face ids get the same list object."""
+        found, result = {}, []
+        for face in faces:
+            face = int(face)
+            if face not in found:
+                labels = self.inverted_index.intersecting([face])
+                pairs = [(label, len(self.topology[label])) for label in labels]
+                if by_area:
+                    pairs = self._by_area(pairs)
+                found[face] = [label for label, _ in sorted(pairs, key=lambda x: x[1])]
+            result.append(found[face])
+        return result
+
     def split_face(
         self, face: int, number: int | None = None, ids: list[int] | None = None
     ) -> list[int]:
@@ -235,26 +643,90 @@ class Geomatcher(MutableMapping):
         * ``number``: Number of new faces to create. Optional, can be inferred from ``ids``. Default is 2 new faces.
         * ``ids``: Iterable of new face ids. Optional, default is the maximum integer in the existing topology plus one. ``ids`` don't have to be integers. If ``ids`` is specified, ``number`` is ignored.
 
-        Returns the new face ids.
+        If face areas are known, the area of ``face`` is divided equally between the new faces.
+
+        Returns the new face ids. To split many faces, use ``split_faces``.
 
         """
-        assert face in self.faces
+        return self.split_faces({face: ids if ids else (number or 2)})[face]
 
-        if ids:
-            ids = set(ids)
-        else:
-            max_int = max(x for x in self.faces if isinstance(x, int))
-            ids = set(range(max_int + 1, max_int + 1 + (number or 2)))
+    def split_faces(self, splits: dict) -> dict:
+        """Split many topological faces at once.
+
+        ``splits`` is a dictionary of ``{face: number of new faces or iterable of new face ids}``; see ``split_face``. Locations including each face are found with the inverted index, and new integer ids are allocated from a running maximum, so the cost doesn't depend on the number of locations or faces in the topology.
+
+        All splits are checked before anything is changed: a ``ValueError`` is raised for faces not in the topology, numbers below one, empty ``ids``, and new ids which already exist or are given for more than one face.
+
+        Returns a dictionary of ``{face: set of new face ids}``.
 
-        for obj in self.topology.values():
-            if face in obj:
+        """
+        new_ids = self._new_face_ids(splits)
+        self._max_face = max(
+            [self._max_face_id()]
+            + [x for ids in new_ids.values() for x in ids if isinstance(x, int)]
+        )
+        areas = (
+            self.face_areas
+            if self._face_areas is not None or self._areas_fp is not None
+            else None
+        )
+        topology, inverted = self.topology, self._base_inverted()
+        row = topology.get("RoW")
+        for face, ids in new_ids.items():
+            labels = list(inverted.split(face, ids))
+            if row is not None and face in row:
+                labels.append("RoW")
+            for label in labels:
+                obj = topology[label]
                 obj.discard(face)
                 obj.update(ids)
 
-        self.faces.discard(face)
-        self.faces.update(ids)
-
-        return ids
+            self.faces.discard(face)
+            self.faces.update(ids)
+            if areas is not None:
+                share = areas.pop(face, 0.0) / len(ids)
+                areas.update((new, share) for new in ids)
+
+        self._area_vector = None
+        self._relations = self._hierarchy = None
+        return new_ids
+
+    def _new_face_ids(self, splits: dict) -> dict:
+        """Check ``splits`` (see ``split_faces``), and return ``{face: set of new face ids}``, without changing anything.
+
+        Raises a ``ValueError`` for unknown faces, counts below one, empty ids, and ids which already exist or are given twice."""
+        new_ids, assigned = {}, set()
+        largest = self._max_face_id()
+        for face, value in splits.items():
+            if face not in self.faces:
+                raise ValueError("Can't split unknown face {}".format(face))
+            if isinstance(value, int):
+                if value < 1:
+                    raise ValueError(
+                        "Face {} must be split into at least one face".format(face)
+                    )
+                ids = set(range(largest + 1, largest + 1 + value))
+            else:
+                ids = set(value)
+                if not ids:
+                    raise ValueError("No new face ids given for face {}".format(face))
+            reused = ids.intersection(self.faces) | ids.intersection(assigned)
+            if reused:
+                raise ValueError(
+                    "New ids for face {} already exist: {}".format(face, reused)
+                )
+            assigned.update(ids)
+            largest = max([largest] + [x for x in ids if isinstance(x, int)])
+            new_ids[face] = ids
+        return new_ids
+
+    def _max_face_id(self) -> int:
+        """Largest integer face id, computed once and then kept up to date by ``split_faces``."""
+        if self._max_face is None:
+            self._max_face = max(
+                (x for x in self.faces if isinstance(x, int)), default=0
+            )
+        return self._max_face
 
     def add_definitions(
         self, data: dict, namespace: str, relative: bool = True
@@ -283,15 +755,363 @@ class Geomatcher(MutableMapping):
 
         """
         if not relative:
-            self.topology.update({(namespace, k): v for k, v in data.items()})
-            self.faces.update(set.union(*data.values()))
+            new = {(namespace, k): self._faceset(v) for k, v in data.items()}
+            self.faces.update(*data.values())
+            self._max_face = None
         else:
-            self.topology.update(
-                {
-                    (namespace, k): set.union(*[self[o] for o in v])
-                    for k, v in data.items()
-                }
+            new = {
+                (namespace, k): self._faceset(set().union(*[self[o] for o in v]))
+                for k, v in data.items()
+            }
+        for key, faces in new.items():
+            old = self.topology.get(key)
+            self.topology[key] = faces
+            self._location_changed(key, old)
+
+    def rest_of_worlds(self, groups: Iterable | Mapping) -> list | dict:
+        """Rest-of-world face sets for many ``groups`` of locations, without changing this ``Geomatcher``.
+
+        Each group is an iterable of locations, or of datasets with a ``location`` key, like the ``objs`` of ``resolved_row``. Returns the faces not used by each group, as a ``frozenset`` (or a ``FaceBitset`` with bitset storage, which should not be modified), in a list, or in a dictionary if ``groups`` is a dictionary of ``{name: group}``. Groups with the same locations share one result.
+
+        Use ``with_row`` to query against one of these definitions."""
+        items = groups.items() if isinstance(groups, Mapping) else enumerate(groups)
+        if self.face_index is not None:
+            all_bits = self.face_index.encode(self.faces)
+
+        results, seen = {}, {}
+        for name, group in items:
+            keys = frozenset(self._actual_key(obj) for obj in _locations(group))
+            try:
+                results[name] = seen[keys]
+                continue
+            except KeyError:
+                pass
+            if self.face_index is not None:
+                covered = 0
+                for key in keys:
+                    covered |= self._bits(self[key])
+                row = FaceBitset.from_bits(all_bits & ~covered, self.face_index)
+            else:
+                row = frozenset(self.faces.difference(*[self[key] for key in keys]))
+            results[name] = seen[keys] = row
+        return results if isinstance(groups, Mapping) else list(results.values())
+
+    def with_row(self, row: Iterable) -> "Geomatcher":
+        """Read-only view of this ``Geomatcher`` in which ``RoW`` has the faces ``row``, e.g. from ``rest_of_worlds``.
+
+        Unlike ``resolved_row``, this instance isn't changed, and its indices are shared instead of rebuilt, so views are cheap and many can be queried at once from different threads. Don't change the view, or this instance while views are in use."""
+        if self.face_index is None:
+            row = frozenset(row)
+        else:
+            row = self._faceset(row)
+        # Views share the indices, which never include ``RoW``; see ``hierarchy``
+        self._base_hierarchy(), self._base_inverted()
+        view = copy.copy(self)
+        view.topology = ChainMap({"RoW": row}, self.topology)
+        view._relations = None
+        view._resolved = _LRUCache(KEY_CACHE_SIZE)
+        return view
+
+    def freeze(self) -> "FrozenGeomatcher":
+        """Immutable snapshot of this ``Geomatcher``, which can be queried from many threads at once. See ``FrozenGeomatcher``."""
+        frozen = FrozenGeomatcher(
+            self.topology,
+            faces=self.faces,
+            default_namespace=self.default_namespace,
+            use_coco=self.coco,
+            use_bitsets=self.face_index is not None,
+            face_areas=self._face_areas,
+        )
+        frozen._areas_fp = self._areas_fp
+        return frozen
+
+    def pack(self) -> bytes:
+        """Pack this ``Geomatcher`` into contiguous arrays, in the binary format of ``constructive_geometries.packed``: a table of location labels, row offsets, and face ids, followed by the inverted index and face areas.
+
+        Settings and the nodes and edges of the containment hierarchy are stored in the metadata, so ``FrozenGeomatcher.from_packed`` doesn't have to recompute subset relationships. Face areas are stored if they were given or loaded; otherwise the path of the areas file, if any. The packed faces are ``self.faces`` and the faces of all locations, including locations defined with ``geomatcher[key] = faces``, which aren't added to ``self.faces``. Face ids must be 32 bit integers, and labels strings or tuples of strings."""
+        positions = {label: i for i, label in enumerate(self.topology)}
+        hierarchy = self._base_hierarchy()
+        nodes = hierarchy.nodes()
+        metadata = {
+            "default_namespace": self.default_namespace,
+            "use_coco": self.coco,
+            "use_bitsets": self.face_index is not None,
+            "hierarchy": {
+                "nodes": [
+                    positions[nodes[label]] if label in nodes else None
+                    for label in self.topology
+                ],
+                "edges": [
+                    [positions[label], positions[parent]]
+                    for label, parent in hierarchy.edges()
+                ],
+            },
+        }
+        if self._face_areas is None and self._areas_fp is not None:
+            metadata["areas_fp"] = str(self._areas_fp)
+        return pack_topology(
+            self.topology,
+            metadata,
+            sorted(set(self.faces).union(*self.topology.values())),
+            inverted=self._indexed(),
+            areas=self._face_areas,
+        )
+
+    def to_shared_memory(self) -> SharedMemory:
+        """Copy ``pack()`` into a new block of shared memory, from which worker processes can create a ``FrozenGeomatcher`` with ``FrozenGeomatcher.from_shared_memory(shm.name)``, instead of receiving a pickled copy each.
+
+        The caller owns the block, and must ``close()`` and ``unlink()`` it when the workers are finished."""
+        data = self.pack()
+        shm = SharedMemory(create=True, size=len(data))
+        shm.buf[: len(data)] = data
+        return shm
+
+    @has_arrays
+    def area(self, key: str | tuple) -> float:
+        """Area of location ``key``, summed from the areas of its faces (see ``face_areas``)."""
+        return float(self._label_areas([self._actual_key(key)])[0])
+
+    @has_arrays
+    def overlap_fractions(
+        self,
+        key: str | tuple,
+        include_self: bool = False,
+        only: Iterable | None = None,
+    ) -> dict:
+        """Fraction of the area of ``key`` covered by each location which intersects it, e.g. to allocate inventory data from ``key`` to smaller regions.
+
+        Computed from face areas (see ``face_areas``) for all intersecting locations (or for locations in ``only``) at once. Returns a dictionary of ``{location: fraction}``, largest fraction first; fractions are rounded like areas in ``by_area`` sorting, so locations covering all of ``key`` have a fraction of exactly 1. Raises a ``ValueError`` if ``key`` has no area."""
+        faces = self[key]
+        key = self._actual_key(key)
+        if only is None:
+            labels = list(self.inverted_index.intersecting(faces))
+        else:
+            labels = [self._actual_key(k) for k in only]
+        if not include_self:
+            labels = [k for k in labels if k != key]
+
+        total = self.area(key)
+        if not total:
+            raise ValueError("Location {} has no area".format(key))
+        overlaps = _rounded(self._label_areas(labels, faces) / total) if labels else []
+        return dict(
+            sorted(
+                ((k, v) for k, v in zip(labels, overlaps) if v > 0),
+                key=lambda x: x[1],
+                reverse=True,
+            )
+        )
+
+    @has_arrays
+    def overlap_matrix(
+        self,
+        suppliers: list,
+        consumers: list,
+        by_area: bool = True,
+        fractions: bool = True,
+        dense: bool = False,
+    ):
+        """Overlap between every location in ``suppliers`` and every location in ``consumers``, computed with one sparse matrix product.
+
+        Returns a ``(len(suppliers), len(consumers))`` scipy sparse matrix (or numpy array if ``dense``), with rows and columns in the order given. Entry ``[i, j]`` is:
+
+            * with ``fractions``: the fraction of the area of ``consumers[j]`` covered by ``suppliers[i]``
+            * without ``fractions``: the area shared by ``suppliers[i]`` and ``consumers[j]``
+
+        If ``by_area`` is false, the number of shared faces is used instead of area. Consumers without area or faces have zero fractions.
+
+        """
+        suppliers = [self._actual_key(k) for k in suppliers]
+        consumers = [self._actual_key(k) for k in consumers]
+        index = self._area_array()[0] if by_area else None
+        _, matrix = self._incidence_matrix(suppliers + consumers, index)
+        supply, demand = matrix[: len(suppliers)], matrix[len(suppliers) :]
+        if by_area:
+            weights = self._area_array()[1]
+            supply = supply.multiply(weights[None, :]).tocsr()
+            totals = demand @ weights
+        else:
+            totals = np.asarray(demand.sum(axis=1)).ravel()
+
+        overlaps = (supply @ demand.T).tocsr()
+        if fractions:
+            inverse = np.divide(
+                1.0, totals, out=np.zeros(len(totals)), where=totals > 0
+            )
+            overlaps = overlaps.multiply(inverse[None, :]).tocsr()
+        return overlaps.toarray() if dense else overlaps
+
+    @has_arrays
+    def relation_matrices(self) -> RelationMatrices:
+        """Calculate the spatial relationships between all locations in one sparse matrix product.
+
+        Builds a sparse location × face incidence matrix ``A``, and computes ``A @ A.T``. Returns a ``RelationMatrices`` named tuple with:
+
+            * ``labels``: List of location keys, giving the row and column order of the matrices
+            * ``intersections``: Sparse integer matrix; ``intersections[i, j]`` is the number of faces shared by ``labels[i]`` and ``labels[j]``
+            * ``subsets``: Sparse boolean matrix; ``subsets[i, j]`` is ``True`` if ``labels[i]`` is completely within ``labels[j]``
+            * ``supersets``: Transpose of ``subsets``; ``supersets[i, j]`` is ``True`` if ``labels[i]`` completely contains ``labels[j]``
+
+        Locations without faces are not subsets or supersets of anything. The result is cached until the topology is changed.
+
+        """
+        if self._relations is None:
+            labels, matrix = self._incidence_matrix(list(self.topology))
+            intersections = (matrix @ matrix.T).tocsr()
+            sizes = np.asarray(matrix.sum(axis=1)).ravel()
+
+            coo = intersections.tocoo()
+            mask = coo.data == sizes[coo.row]
+            subsets = sparse.csr_array(
+                (np.ones(mask.sum(), dtype=bool), (coo.row[mask], coo.col[mask])),
+                shape=intersections.shape,
+            )
+            self._relations = RelationMatrices(
+                labels, intersections, subsets, subsets.T.tocsr()
             )
+        return self._relations
+
+    def _incidence_matrix(self, labels: list, index: FaceIndex | None = None) -> tuple:
+        """Sparse ``(len(labels), number of faces)`` matrix with ones where a location includes a face. Columns follow ``index``, or ``self.face_index`` if bitset storage is used."""
+        if index is None:
+            index = self.face_index if self.face_index is not None else FaceIndex()
+        indptr, indices = [0], []
+        for label in labels:
+            indices.extend(index.add(face) for face in self[label])
+            indptr.append(len(indices))
+        return labels, sparse.csr_array(
+            (
+                np.ones(len(indices), dtype=np.int32),
+                np.array(indices, dtype=np.int64),
+                np.array(indptr, dtype=np.int64),
+            ),
+            shape=(len(labels), len(index)),
+        )
+
+
+class FrozenGeomatcher(Geomatcher):
+    """Immutable snapshot of a ``Geomatcher``, usually created with ``Geomatcher.freeze``.
+
+    Location face sets are ``frozenset`` (or ``FaceBitset`` with bitset storage, which must not be modified), and the containment hierarchy and inverted index are built on creation, so queries never change shared state. Instances can therefore be queried from many threads at once, and are pickled with their indices, so worker processes don't rebuild them.
+
+    Snapshots created with ``from_packed`` or ``from_shared_memory`` instead read a packed buffer in place, and only decode the face sets of locations which are used; see ``from_packed``.
+
+    Methods which would change the topology raise a ``TypeError``. Instead of ``resolved_row``, use ``rest_of_worlds`` and ``with_row``.
+
+    """
+
+    def __init__(
+        self,
+        topology: Mapping,
+        faces: Iterable | None = None,
+        default_namespace: str | None = None,
+        use_coco: bool = True,
+        use_bitsets: bool = False,
+        face_areas: dict | None = None,
+    ):
+        super().__init__(
+            {key: frozenset(value) for key, value in topology.items()},
+            default_namespace=default_namespace,
+            use_coco=use_coco,
+            use_bitsets=use_bitsets,
+            face_areas=face_areas,
+        )
+        if faces is not None:
+            self.faces = set(faces)
+            if self.face_index is not None:
+                self.face_index.encode(self.faces)
+        self.faces = frozenset(self.faces)
+        # Build indices now, so that queries only read them
+        self._base_hierarchy(), self._base_inverted()
+
+    # ``PackedTopology`` with the face areas of snapshots created by ``from_packed``
+    _packed_areas = None
+
+    @property
+    def face_areas(self) -> dict:
+        """Dictionary of ``{face id: area}``, loaded on first use from the packed buffer or the areas file."""
+        if self._face_areas is None and self._packed_areas is not None:
+            self._face_areas = self._packed_areas.face_areas()
+        return super().face_areas
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("FrozenGeomatcher can't be changed")
+
+    __setitem__ = __delitem__ = _immutable
+    split_faces = add_definitions = invalidate = _immutable
+
+    def freeze(self) -> "FrozenGeomatcher":
+        return self
+
+    @classmethod
+    def from_packed(cls, buffer) -> "FrozenGeomatcher":
+        """Create from the output of ``Geomatcher.pack``, without copying it. ``buffer`` can be ``bytes``, a memory map, the buffer of a ``SharedMemory`` block, or a ``PackedTopology``.
+
+        Face sets are decoded from ``buffer`` when a location is first accessed, and the containment hierarchy and inverted index are read from the stored nodes, edges, and index rows, so creating a snapshot doesn't depend on the number of faces of each location. ``buffer`` must not be changed while the snapshot is in use."""
+        packed = (
+            buffer if isinstance(buffer, PackedTopology) else PackedTopology(buffer)
+        )
+        settings = packed.metadata
+        obj = cls.__new__(cls)
+        Geomatcher.__init__(
+            obj,
+            {},
+            default_namespace=settings["default_namespace"],
+            use_coco=settings["use_coco"],
+        )
+        obj.faces = frozenset(packed.all_faces)
+        if settings["use_bitsets"]:
+            obj.face_index = FaceIndex(packed.all_faces)
+            obj.topology = _PackedFaceSets(
+                packed, partial(FaceBitset, index=obj.face_index)
+            )
+        else:
+            obj.topology = _PackedFaceSets(packed, frozenset)
+        offsets = packed.offsets
+        obj._hierarchy = PackedHierarchy(
+            packed.labels,
+            settings["hierarchy"]["nodes"],
+            settings["hierarchy"]["edges"],
+            [i for i in range(len(packed)) if offsets[i] == offsets[i + 1]],
+        )
+        obj._inverted = PackedInvertedIndex(packed)
+        if packed.areas is not None:
+            obj._packed_areas = packed
+        elif settings.get("areas_fp"):
+            obj._areas_fp = Path(settings["areas_fp"])
+        return obj
+
+    @classmethod
+    def from_shared_memory(cls, name: str) -> "FrozenGeomatcher":
+        """Create from a shared memory block written by ``Geomatcher.to_shared_memory``, without copying it (see ``from_packed``).
+
+        The block is only read. It stays open while the snapshot, or any ``with_row`` view of it, is in use, and is closed, but not unlinked, afterwards."""
+        return cls.from_packed(PackedTopology.attach(name))
+
+
+class _PackedFaceSets(Mapping):
+    """Read-only ``{label: face set}`` mapping over a ``PackedTopology``. Face sets are created with ``convert`` when a label is first accessed, and then kept."""
+
+    def __init__(self, packed: PackedTopology, convert):
+        self.packed = packed
+        self.convert = convert
+        self._decoded = {}
+
+    def __getitem__(self, label):
+        try:
+            return self._decoded[label]
+        except KeyError:
+            faces = self._decoded[label] = self.convert(self.packed[label])
+            return faces
+
+    def __iter__(self) -> Iterable:
+        return iter(self.packed)
+
+    def __len__(self) -> int:
+        return len(self.packed)
+
+    def __contains__(self, label) -> bool:
+        return label in self.packed
 
 
 @contextmanager
@@ -300,17 +1120,12 @@ def resolved_row(objs, geomatcher):
 
     Will overwrite any existing ``RoW``.
 
-    On exiting the context manager, ``RoW`` is deleted."""
+    On exiting the context manager, ``RoW`` is deleted.
 
-    def get_locations(lst):
-        for elem in lst:
-            try:
-                yield elem["location"]
-            except TypeError:
-                yield elem
+    To compute many rest-of-world definitions, or to use them from several threads, use ``Geomatcher.rest_of_worlds`` and ``Geomatcher.with_row``, which don't change ``geomatcher``."""
 
     geomatcher["RoW"] = geomatcher.faces.difference(
-        reduce(set.union, [geomatcher[obj] for obj in get_locations(objs)])
+        *[geomatcher[obj] for obj in _locations(objs)]
     )
     yield geomatcher
     del geomatcher["RoW"]
@@ -0,0 +1,318 @@
+from collections import Counter, defaultdict
+from typing import Iterable
+
+from .bitset import FaceBitset, FaceIndex
+
+
+class ContainmentHierarchy:
+    """Directed acyclic graph of the subset relationships between location face sets.
+
+    Locations with identical face sets share one node; nodes are ``frozenset`` objects of face ids. Only the transitive reduction of the subset relation is stored: ``parents[node]`` are the smallest nodes which strictly contain ``node``, and ``children[node]`` are the largest nodes strictly contained in ``node``. ``within`` walks up from a location and ``contained`` walks down, so neither has to look at unrelated locations.
+
+    The hierarchy can be updated one location at a time with ``add`` and ``remove``. It keeps a snapshot of the face sets it was given; it must be rebuilt if those sets are modified in place."""
+
+    def __init__(self, topology: dict | None = None):
+        self.labels = {}
+        self.node_of = {}
+        self.parents = {}
+        self.children = {}
+        self._nodes_with_face = defaultdict(set)
+        self._order = {}
+        # Plain integer, not ``itertools.count``, so that hierarchies can be pickled
+        self._counter = 0
+        if topology:
+            # Adding big nodes first means new nodes never have existing subsets
+            for label in sorted(topology, key=lambda x: len(topology[x]), reverse=True):
+                self._add(label, topology[label], has_subsets=False)
+            # Reapply topology order, which is used to break ties when sorting
+            self._order = {label: self._counter + i for i, label in enumerate(topology)}
+            self._counter += len(topology)
+
+    @classmethod
+    def from_edges(
+        cls, topology: dict, edges: Iterable[tuple]
+    ) -> "ContainmentHierarchy":
+        """Rebuild the hierarchy of ``topology`` from its ``edges`` (see ``edges``), without computing any subset relationships."""
+        obj = cls()
+        for label, faces in topology.items():
+            node = frozenset(faces)
+            obj.node_of[label] = node
+            obj._order[label] = obj._counter
+            obj._counter += 1
+            if node in obj.labels:
+                obj.labels[node].append(label)
+                continue
+            obj.labels[node] = [label]
+            obj.parents[node], obj.children[node] = set(), set()
+            for face in node:
+                obj._nodes_with_face[face].add(node)
+        for label, parent in edges:
+            node, other = obj.node_of[label], obj.node_of[parent]
+            obj.parents[node].add(other)
+            obj.children[other].add(node)
+        return obj
+
+    def edges(self) -> list[tuple]:
+        """``(label, parent label)`` pairs for all edges of the hierarchy, using the first label of each node."""
+        return [
+            (self.labels[node][0], self.labels[parent][0])
+            for node, parents in self.parents.items()
+            for parent in parents
+        ]
+
+    def nodes(self) -> dict:
+        """``{label: first label of its node}``. Labels with identical face sets share a node, which is named after its first label in ``edges``."""
+        return {label: self.labels[node][0] for label, node in self.node_of.items()}
+
+    def __contains__(self, label) -> bool:
+        return label in self.node_of
+
+    def __len__(self) -> int:
+        return len(self.node_of)
+
+    def _node(self, faces: Iterable) -> frozenset:
+        return frozenset(faces)
+
+    def _index_node(self, node: frozenset) -> None:
+        for face in node:
+            self._nodes_with_face[face].add(node)
+
+    def _unindex_node(self, node: frozenset) -> None:
+        for face in node:
+            self._nodes_with_face[face].discard(node)
+            if not self._nodes_with_face[face]:
+                del self._nodes_with_face[face]
+
+    def _supersets(self, node: frozenset) -> set:
+        if not node:
+            return set(self.parents)
+        candidates = sorted(
+            (self._nodes_with_face.get(face, set()) for face in node), key=len
+        )
+        result = set(candidates[0])
+        for other in candidates[1:]:
+            if not result:
+                break
+            result.intersection_update(other)
+        return result
+
+    def _subsets(self, node: frozenset) -> set:
+        counts = Counter(
+            other for face in node for other in self._nodes_with_face.get(face, ())
+        )
+        result = {other for other, count in counts.items() if count == len(other)}
+        if frozenset() in self.parents:
+            result.add(frozenset())
+        return result
+
+    def add(self, label, faces: Iterable) -> None:
+        """Add location ``label`` with face ids ``faces``, replacing any existing definition of ``label``."""
+        self._add(label, faces)
+
+    def _add(self, label, faces: Iterable, has_subsets: bool = True) -> None:
+        if label in self.node_of:
+            self._discard(label)
+        else:
+            self._order[label] = self._counter
+            self._counter += 1
+
+        node = self._node(faces)
+        self.node_of[label] = node
+        if node in self.labels:
+            self.labels[node].append(label)
+            return
+
+        supersets = self._supersets(node)
+        subsets = self._subsets(node) if has_subsets else set()
+        # ``supersets`` is closed upwards and ``subsets`` downwards, so the
+        # immediate relatives are those with no neighbour inside the same group
+        parents = {p for p in supersets if not self.children[p] & supersets}
+        children = {c for c in subsets if not self.parents[c] & subsets}
+
+        for child in children:
+            for parent in self.parents[child] & supersets:
+                self.children[parent].discard(child)
+            self.parents[child] -= supersets
+            self.parents[child].add(node)
+        for parent in parents:
+            self.children[parent].add(node)
+
+        self.labels[node] = [label]
+        self.parents[node] = parents
+        self.children[node] = children
+        self._index_node(node)
+
+    def remove(self, label) -> None:
+        """Remove location ``label``."""
+        self._discard(label)
+        del self._order[label]
+
+    def _discard(self, label) -> None:
+        node = self.node_of.pop(label)
+        self.labels[node].remove(label)
+        if self.labels[node]:
+            return
+
+        parents, children = self.parents.pop(node), self.children.pop(node)
+        for parent in parents:
+            self.children[parent].discard(node)
+        for child in children:
+            self.parents[child].discard(node)
+        # Reconnect unless another path between parent and child remains
+        for child in children:
+            for parent in parents:
+                if not any(
+                    self._is_proper_subset(other, parent)
+                    for other in self.parents[child]
+                ):
+                    self.parents[child].add(parent)
+                    self.children[parent].add(child)
+
+        del self.labels[node]
+        self._unindex_node(node)
+
+    def _is_proper_subset(self, node: frozenset, other: frozenset) -> bool:
+        return node < other
+
+    def _walk(self, label, edges: dict) -> set:
+        start = self.node_of[label]
+        seen, stack = {start}, [start]
+        while stack:
+            for other in edges[stack.pop()]:
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        return seen
+
+    def _labels(self, nodes: Iterable) -> list:
+        labels = [label for node in nodes for label in self.labels[node]]
+        labels.sort(key=self._order.__getitem__)
+        return labels
+
+    def within(self, label) -> list:
+        """Labels of all locations which contain ``label``, including ``label`` itself, in insertion order."""
+        return self._labels(self._walk(label, self.parents))
+
+    def contained(self, label) -> list:
+        """Labels of all non-empty locations within ``label``, including ``label`` itself, in insertion order."""
+        return self._labels(node for node in self._walk(label, self.children) if node)
+
+
+class BitsetHierarchy(ContainmentHierarchy):
+    """``ContainmentHierarchy`` of a topology of ``FaceBitset`` face sets sharing the ``FaceIndex`` ``index``.
+
+    Nodes are small integer ids, and ``bits[node]`` is the integer bitmap of its face set, shared with the topology instead of copied. Large integers don't cache their hash, so they aren't used as keys directly. The empty face set is node ``0``, so that empty nodes are still false. Supersets and subsets of a new node are found by testing every node with integer operations, so no index of nodes by face is kept; adding a location takes time proportional to the number of nodes."""
+
+    def __init__(self, topology: dict | None = None, index: FaceIndex | None = None):
+        self.index = FaceIndex() if index is None else index
+        self.bits = {}
+        self._ids = {}
+        self._next_id = 1
+        super().__init__(topology)
+
+    def _node(self, faces: Iterable) -> int:
+        if isinstance(faces, FaceBitset) and faces.index is self.index:
+            bits = faces.bits
+        else:
+            bits = self.index.encode(faces)
+        node = self._ids.get(bits)
+        if node is None:
+            if bits:
+                node, self._next_id = self._next_id, self._next_id + 1
+            else:
+                node = 0
+            self._ids[bits], self.bits[node] = node, bits
+        return node
+
+    def _index_node(self, node: int) -> None:
+        pass
+
+    def _unindex_node(self, node: int) -> None:
+        del self._ids[self.bits.pop(node)]
+
+    def _supersets(self, node: int) -> set:
+        bits = self.bits[node]
+        return {
+            other
+            for other, other_bits in self.bits.items()
+            if other != node and not bits & ~other_bits
+        }
+
+    def _subsets(self, node: int) -> set:
+        bits = self.bits[node]
+        return {
+            other
+            for other, other_bits in self.bits.items()
+            if other != node and not other_bits & ~bits
+        }
+
+    def _is_proper_subset(self, node: int, other: int) -> bool:
+        return node != other and not self.bits[node] & ~self.bits[other]
+
+
+class PackedHierarchy:
+    """Read-only ``ContainmentHierarchy`` rebuilt from the ``nodes`` and ``edges`` stored by ``Geomatcher.pack``, without looking at any face sets.
+
+    Locations are identified by their position in ``labels``. ``nodes[i]`` is the position of the label naming the node of ``labels[i]``, or ``None`` if ``labels[i]`` isn't in the hierarchy; ``edges`` are ``(node, parent node)`` pairs of positions, and ``empty`` are the positions of locations without faces. Labels are returned in the order of ``labels``."""
+
+    def __init__(
+        self,
+        labels: list,
+        nodes: list,
+        edges: Iterable[tuple],
+        empty: Iterable[int] = (),
+    ):
+        self.labels = labels
+        self.node_of = {
+            label: node for label, node in zip(labels, nodes) if node is not None
+        }
+        self.members = defaultdict(list)
+        for position, node in enumerate(nodes):
+            if node is not None:
+                self.members[node].append(position)
+        self.parents, self.children = defaultdict(list), defaultdict(list)
+        for node, parent in edges:
+            self.parents[node].append(parent)
+            self.children[parent].append(node)
+        self.empty = set(empty)
+
+    def nodes(self) -> dict:
+        """``{label: first label of its node}``; see ``ContainmentHierarchy.nodes``."""
+        return {label: self.labels[node] for label, node in self.node_of.items()}
+
+    def edges(self) -> list[tuple]:
+        """``(label, parent label)`` pairs for all edges of the hierarchy."""
+        return [
+            (self.labels[node], self.labels[parent])
+            for node, parents in self.parents.items()
+            for parent in parents
+        ]
+
+    def __contains__(self, label) -> bool:
+        return label in self.node_of
+
+    def __len__(self) -> int:
+        return len(self.node_of)
+
+    def _walk(self, label, edges: dict) -> set:
+        start = self.node_of[label]
+        seen, stack = {start}, [start]
+        while stack:
+            for other in edges.get(stack.pop(), ()):
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        return seen
+
+    def _labels(self, nodes: Iterable) -> list:
+        positions = sorted(i for node in nodes for i in self.members[node])
+        return [self.labels[i] for i in positions]
+
+    def within(self, label) -> list:
+        """Labels of all locations which contain ``label``, including ``label`` itself."""
+        return self._labels(self._walk(label, self.parents))
+
+    def contained(self, label) -> list:
+        """Labels of all non-empty locations within ``label``, including ``label`` itself."""
+        nodes = self._walk(label, self.children)
+        return self._labels(node for node in nodes if node not in self.empty)
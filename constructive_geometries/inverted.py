@@ -0,0 +1,164 @@
+from collections import defaultdict
+from typing import Iterable
+
+
+class InvertedIndex:
+    """Inverted index from face ids to the labels of the locations which include them.
+
+    Used to find the locations intersecting a face set without looking at locations which share no faces with it. Locations are returned in the order in which they were first added, so that results can be sorted in the same way as a scan over the topology."""
+
+    def __init__(self, topology: dict | None = None):
+        self.locations = defaultdict(set)
+        self._order = {}
+        # Plain integer, not ``itertools.count``, so that indices can be pickled
+        self._counter = 0
+        for label, faces in (topology or {}).items():
+            self.add(label, faces)
+
+    def __contains__(self, face) -> bool:
+        return face in self.locations
+
+    def add(self, label, faces: Iterable) -> None:
+        """Add location ``label`` with face ids ``faces``."""
+        if label not in self._order:
+            self._order[label] = self._counter
+            self._counter += 1
+        for face in faces:
+            self.locations[face].add(label)
+
+    def remove(self, label, faces: Iterable) -> None:
+        """Remove location ``label``, which had the face ids ``faces``."""
+        self._discard(label, faces)
+        self._order.pop(label, None)
+
+    def replace(self, label, old: Iterable, new: Iterable) -> None:
+        """Change the face ids of location ``label`` from ``old`` to ``new``, keeping its position."""
+        self._discard(label, old)
+        self.add(label, new)
+
+    def _discard(self, label, faces: Iterable) -> None:
+        for face in faces:
+            labels = self.locations.get(face)
+            if labels is not None:
+                labels.discard(label)
+                if not labels:
+                    del self.locations[face]
+
+    def split(self, face, ids: Iterable) -> set:
+        """Give every location including ``face`` the new face ids ``ids`` instead. Returns the labels of these locations."""
+        labels = self.locations.pop(face, set())
+        if labels:
+            for new in ids:
+                self.locations[new].update(labels)
+        return labels
+
+    def intersecting(self, faces: Iterable) -> list:
+        """Labels of locations sharing at least one face with ``faces``, in insertion order."""
+        get = self.locations.get
+        labels = set().union(*[get(face, ()) for face in faces])
+        return sorted(labels, key=self._order.__getitem__)
+
+
+class PackedInvertedIndex:
+    """Read-only ``InvertedIndex`` backed by the inverted index rows of a ``PackedTopology`` (see ``pack_topology``).
+
+    The row of a face is decoded when the face is first queried, and then kept. Labels are returned in packed order."""
+
+    def __init__(self, packed):
+        if packed.inverted_offsets is None:
+            raise ValueError("Packed topology has no inverted index")
+        self.packed = packed
+        self._rows = None
+        self._decoded = {}
+
+    def _positions(self, face) -> tuple:
+        """Positions of the labels including ``face``."""
+        try:
+            return self._decoded[face]
+        except KeyError:
+            pass
+        if self._rows is None:
+            self._rows = {face: row for row, face in enumerate(self.packed.all_faces)}
+        row = self._rows.get(face)
+        if row is None:
+            return ()
+        offsets = self.packed.inverted_offsets
+        positions = self._decoded[face] = tuple(
+            self.packed.inverted_labels[offsets[row] : offsets[row + 1]]
+        )
+        return positions
+
+    def __contains__(self, face) -> bool:
+        return bool(self._positions(face))
+
+    def intersecting(self, faces: Iterable) -> list:
+        """Labels of locations sharing at least one face with ``faces``, in packed order."""
+        positions = set().union(*[self._positions(face) for face in faces])
+        labels = self.packed.labels
+        return [labels[i] for i in sorted(positions)]
+
+
+class BitsetInvertedIndex(InvertedIndex):
+    """``InvertedIndex`` which stores the locations including each face as an integer bitmap instead of a set of labels.
+
+    Each label is given the next bit position when it is first added, and positions aren't reused, so the labels of a bitmap are decoded in insertion order without sorting. Used for ``FaceBitset`` topologies, whose face sets are also bitmaps."""
+
+    def __init__(self, topology: dict | None = None):
+        self.locations = {}
+        self._order = {}
+        self._labels = []
+        for label, faces in (topology or {}).items():
+            self.add(label, faces)
+
+    def _decode(self, bits: int) -> Iterable:
+        labels = self._labels
+        while bits:
+            low = bits & -bits
+            yield labels[low.bit_length() - 1]
+            bits ^= low
+
+    def add(self, label, faces: Iterable) -> None:
+        """Add location ``label`` with face ids ``faces``."""
+        position = self._order.get(label)
+        if position is None:
+            position = self._order[label] = len(self._labels)
+            self._labels.append(label)
+        bit, locations = 1 << position, self.locations
+        for face in faces:
+            locations[face] = locations.get(face, 0) | bit
+
+    def remove(self, label, faces: Iterable) -> None:
+        """Remove location ``label``, which had the face ids ``faces``."""
+        self._discard(label, faces)
+        position = self._order.pop(label, None)
+        if position is not None:
+            self._labels[position] = None
+
+    def _discard(self, label, faces: Iterable) -> None:
+        position = self._order.get(label)
+        if position is None:
+            return
+        mask, locations = ~(1 << position), self.locations
+        for face in faces:
+            bits = locations.get(face)
+            if bits is not None:
+                bits &= mask
+                if bits:
+                    locations[face] = bits
+                else:
+                    del locations[face]
+
+    def split(self, face, ids: Iterable) -> set:
+        """Give every location including ``face`` the new face ids ``ids`` instead. Returns the labels of these locations."""
+        bits, locations = self.locations.pop(face, 0), self.locations
+        if bits:
+            for new in ids:
+                locations[new] = locations.get(new, 0) | bits
+        return set(self._decode(bits))
+
+    def intersecting(self, faces: Iterable) -> list:
+        """Labels of locations sharing at least one face with ``faces``, in insertion order."""
+        get, bits = self.locations.get, 0
+        for face in faces:
+            bits |= get(face, 0)
+        return list(self._decode(bits))
@@ -0,0 +1,28 @@
+import importlib
+from importlib.util import find_spec
+
+
+def available(*names: str) -> bool:
+    """Check if all modules ``names`` are installed, without importing them."""
+    try:
+        return all(find_spec(name) is not None for name in names)
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule:
+    """Stand-in for the module ``name``, which is only imported when one of its attributes is first used.
+
+    Keeps optional and slow to import dependencies out of ``import constructive_geometries``."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self) -> str:
+        return "<LazyModule {}>".format(self._name)
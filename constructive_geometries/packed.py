@@ -0,0 +1,290 @@
+import hashlib
+import json
+import math
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Iterable
+
+DATA_DIR = Path(__file__).parent.resolve() / "data"
+MAGIC = b"CGTOPO01"
+AREAS_MAGIC = b"CGAREA01"
+ALIGNMENT = 8
+
+
+def _padding(length: int) -> int:
+    return -length % ALIGNMENT
+
+
+def _array(typecode: str, values: Iterable, itemsize: int = 4) -> array:
+    arr = array(typecode, values)
+    if arr.itemsize != itemsize:
+        raise ValueError(
+            "Packed files need {} byte {} arrays".format(itemsize, typecode)
+        )
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+def pack_topology(
+    data: Mapping,
+    metadata: dict | None = None,
+    all_faces: Iterable[int] | None = None,
+    inverted: Mapping | None = None,
+    areas: Mapping | None = None,
+    source: str | None = None,
+) -> bytes:
+    """Pack a topology of ``{label: [face ids]}`` into a compact binary format.
+
+    The format is a CSR-style layout which can be memory-mapped and read without parsing:
+
+        * 8 byte magic string ``CGTOPO01``
+        * Header length as little-endian unsigned 32 bit integer, followed by a UTF-8 JSON header with ``labels``, ``metadata``, ``all_faces`` (boolean), ``inverted`` and ``areas`` (``true``) if these sections are present, and ``source`` if given
+        * Row offsets (number of labels plus one, plus one more if ``all_faces`` is given) as unsigned 32 bit integers
+        * Face ids as signed 32 bit integers
+        * If ``inverted`` is given, an inverted index with a row for each face in ``all_faces``: row offsets as unsigned 32 bit integers, then the positions of the labels of ``inverted`` which include the face, in label order
+        * If ``areas`` is given, the area of each face in ``all_faces`` as a 64 bit float, ``NaN`` if unknown
+
+    Sections are padded to 8 bytes. Labels must be strings or lists of strings (namespaced keys are stored as lists); face ids must be integers. ``all_faces`` is stored as a final unlabelled row, and is needed for ``inverted`` and ``areas``. ``inverted`` is ``{label: face ids}`` for labels in ``data``, usually ``data`` itself or part of it. ``source`` is the SHA 256 hash of the file ``data`` was converted from, so that readers can tell whether the packed file is out of date."""
+    labels = list(data)
+    rows = [data[label] for label in labels]
+    if all_faces is not None:
+        all_faces = list(all_faces)
+        rows.append(all_faces)
+    elif inverted is not None or areas is not None:
+        raise ValueError("An inverted index or areas need all_faces")
+
+    offsets, faces = _csr(rows)
+    header = {
+        "labels": labels,
+        "metadata": metadata or {},
+        "all_faces": all_faces is not None,
+    }
+    if source is not None:
+        header["source"] = source
+    sections = [_array("I", offsets), _array("i", faces)]
+    if inverted is not None:
+        header["inverted"] = True
+        positions = {label: i for i, label in enumerate(labels)}
+        including = {face: [] for face in all_faces}
+        for label, label_faces in inverted.items():
+            for face in label_faces:
+                including[face].append(positions[label])
+        offsets, values = _csr(sorted(including[face]) for face in all_faces)
+        sections.extend([_array("I", offsets), _array("I", values)])
+    if areas is not None:
+        header["areas"] = True
+        values = (areas.get(face, math.nan) for face in all_faces)
+        sections.append(_array("d", values, itemsize=8))
+
+    header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    parts = [MAGIC, struct.pack("<I", len(header)), header]
+    parts.append(b"\0" * _padding(len(MAGIC) + 4 + len(header)))
+    for i, section in enumerate(sections):
+        if i:
+            parts.append(b"\0" * _padding(len(parts[-1])))
+        parts.append(section.tobytes())
+    return b"".join(parts)
+
+
+def _csr(rows: Iterable[Iterable]) -> tuple[list, list]:
+    """Row offsets and concatenated values of ``rows``."""
+    offsets, values = [0], []
+    for row in rows:
+        values.extend(row)
+        offsets.append(len(values))
+    return offsets, values
+
+
+def write_packed(
+    fp: Path,
+    data: Mapping,
+    metadata: dict | None = None,
+    all_faces: Iterable[int] | None = None,
+    source: str | None = None,
+) -> Path:
+    """Write ``data`` to ``fp`` in the packed binary format. See ``pack_topology``."""
+    with open(fp, "wb") as f:
+        f.write(pack_topology(data, metadata, all_faces, source=source))
+    return fp
+
+
+def convert_faces_json(
+    json_fp: Path = DATA_DIR / "faces.json", fp: Path = DATA_DIR / "faces.bin"
+) -> Path:
+    """Convert a ``faces.json`` definitions file to the packed binary format. The hash of ``json_fp`` is stored as ``source``."""
+    with open(json_fp, "rb") as f:
+        raw = f.read()
+    obj = json.loads(raw.decode("utf-8"))
+    data = dict(obj["data"])
+    all_faces = data.pop("__all__")
+    source = hashlib.sha256(raw).hexdigest()
+    return write_packed(fp, data, obj["metadata"], all_faces, source)
+
+
+def pack_areas(areas: Mapping) -> bytes:
+    """Pack ``{face id: area}`` into a compact binary format:
+
+        * 8 byte magic string ``CGAREA01``
+        * Number of faces as little-endian unsigned 32 bit integer
+        * Face ids as signed 32 bit integers
+        * Areas as 64 bit floats, in the order of the face ids
+
+    Sections are padded to 8 bytes, so that both arrays can be read without copying."""
+    ids = list(areas)
+    parts = [AREAS_MAGIC, struct.pack("<I", len(ids)), b"\0" * _padding(4)]
+    ids_bytes = _array("i", ids).tobytes()
+    parts.extend([ids_bytes, b"\0" * _padding(len(ids_bytes))])
+    parts.append(_array("d", (areas[i] for i in ids), itemsize=8).tobytes())
+    return b"".join(parts)
+
+
+def unpack_areas(buffer) -> dict[int, float]:
+    """Read ``{face id: area}`` from a buffer in the packed areas format. See ``pack_areas``."""
+    view = memoryview(buffer)
+    if bytes(view[: len(AREAS_MAGIC)]) != AREAS_MAGIC:
+        raise ValueError("Not a packed areas file")
+    (count,) = struct.unpack_from("<I", view, len(AREAS_MAGIC))
+    start = len(AREAS_MAGIC) + 4 + _padding(4)
+    ids, areas = array("i"), array("d")
+    ids.frombytes(view[start : start + count * 4])
+    start += count * 4 + _padding(count * 4)
+    areas.frombytes(view[start : start + count * 8])
+    if sys.byteorder != "little":
+        ids.byteswap()
+        areas.byteswap()
+    return dict(zip(ids, areas))
+
+
+def write_packed_areas(fp: Path, areas: Mapping) -> Path:
+    """Write ``areas`` to ``fp`` in the packed areas format. See ``pack_areas``."""
+    with open(fp, "wb") as f:
+        f.write(pack_areas(areas))
+    return fp
+
+
+def convert_areas_json(
+    json_fp: Path = DATA_DIR / "areas.json", fp: Path = DATA_DIR / "areas.bin"
+) -> Path:
+    """Convert an ``areas.json`` file to the packed areas format."""
+    with open(json_fp, encoding="utf-8") as f:
+        areas = {int(face): area for face, area in json.load(f).items()}
+    return write_packed_areas(fp, areas)
+
+
+class PackedTopology(Mapping):
+    """Read-only mapping of ``{label: [face ids]}`` backed by a buffer in the packed binary format.
+
+    Face ids are only decoded when a label is accessed. Use ``PackedTopology.open`` to memory-map a file, so that the operating system can share its pages between processes, or ``PackedTopology.attach`` to read a shared memory block.
+
+    If the buffer has an inverted index (see ``pack_topology``), its rows are in ``inverted_offsets`` and ``inverted_labels``, otherwise these are ``None``. Face areas, if any, are returned by ``face_areas``. ``source`` is the hash of the file the topology was converted from, or ``None``."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        view = memoryview(buffer)
+        if bytes(view[: len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a packed topology")
+        (length,) = struct.unpack_from("<I", view, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(view[start : start + length]).decode("utf-8"))
+
+        self.metadata = header["metadata"]
+        self.source = header.get("source")
+        self.labels = [
+            tuple(label) if isinstance(label, list) else label
+            for label in header["labels"]
+        ]
+        self.positions = {label: i for i, label in enumerate(self.labels)}
+
+        rows = len(self.labels) + bool(header["all_faces"])
+        start += length + _padding(start + length)
+        self.offsets, start = self._section(view, start, rows + 1, "I")
+        self.faces, start = self._section(view, start, self.offsets[-1], "i")
+        self.all_faces = self._row(rows - 1) if header["all_faces"] else None
+
+        self.inverted_offsets = self.inverted_labels = self.areas = None
+        if header.get("inverted"):
+            count = len(self.all_faces) + 1
+            self.inverted_offsets, start = self._section(view, start, count, "I")
+            count = self.inverted_offsets[-1]
+            self.inverted_labels, start = self._section(view, start, count, "I")
+        if header.get("areas"):
+            self.areas, start = self._section(view, start, len(self.all_faces), "d")
+
+    @classmethod
+    def open(cls, fp: Path) -> "PackedTopology":
+        """Memory-map the packed topology file ``fp``."""
+        with open(fp, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def attach(cls, name: str) -> "PackedTopology":
+        """Read the packed topology in the shared memory block ``name``, without copying it.
+
+        The block stays open as long as the returned object exists, and is then closed, but not unlinked. Before Python 3.13, the block is removed from the resource tracker after attaching, so that it isn't unlinked when this process exits; if this process shares the tracker of the process which created the block, the tracker may then warn when the creator unlinks it."""
+        if sys.version_info >= (3, 13):
+            # Only the creator should unlink the block
+            shm = SharedMemory(name, track=False)
+        else:
+            shm = SharedMemory(name)
+            # Attaching registers the block with the resource tracker, which
+            # would unlink it when this process exits
+            resource_tracker.unregister(shm._name, "shared_memory")
+        obj = cls(shm.buf)
+        # Set last, so that the views into the block are released before it is closed
+        obj._shm = shm
+        return obj
+
+    @classmethod
+    def _section(cls, view: memoryview, start: int, count: int, typecode: str):
+        """Array of ``count`` items at ``start``, and the start of the next section."""
+        size = array(typecode).itemsize * count
+        section = cls._cast(view[start : start + size], typecode)
+        return section, start + size + _padding(size)
+
+    @staticmethod
+    def _cast(view: memoryview, typecode: str):
+        if sys.byteorder == "little":
+            return view.cast(typecode)
+        arr = array(typecode, bytes(view))
+        arr.byteswap()
+        return arr
+
+    def _row(self, position: int) -> list:
+        return self.faces[self.offsets[position] : self.offsets[position + 1]].tolist()
+
+    def face_areas(self) -> dict[int, float]:
+        """``{face id: area}`` for faces in ``all_faces`` with known area."""
+        if self.areas is None:
+            raise ValueError("Packed topology has no face areas")
+        return {
+            face: area
+            for face, area in zip(self.all_faces, self.areas)
+            if not math.isnan(area)
+        }
+
+    def __getitem__(self, label) -> list:
+        return self._row(self.positions[label])
+
+    def __iter__(self) -> Iterable:
+        return iter(self.labels)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __contains__(self, label) -> bool:
+        return label in self.positions
+
+    def __reduce__(self):
+        return (self.__class__, (bytes(self.buffer),))
+
+
+if __name__ == "__main__":
+    convert_faces_json()
+    convert_areas_json()
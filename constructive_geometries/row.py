@@ -0,0 +1,68 @@
+from collections.abc import Mapping
+from typing import Iterable
+
+from .hierarchy import ContainmentHierarchy
+from .inverted import InvertedIndex
+
+
+class RowIndex:
+    """``InvertedIndex`` of a topology, with ``RoW`` defined by the face set ``row`` instead of any ``RoW`` in the topology.
+
+    Doesn't change or copy the underlying index, so one index can be shared by many rest-of-world definitions."""
+
+    def __init__(self, index: InvertedIndex, row: Iterable):
+        self.index = index
+        self.row = row
+
+    def intersecting(self, faces: Iterable) -> list:
+        """Labels of locations sharing at least one face with ``faces``, in insertion order, with ``RoW`` last."""
+        labels = [label for label in self.index.intersecting(faces) if label != "RoW"]
+        if not self.row.isdisjoint(faces):
+            labels.append("RoW")
+        return labels
+
+
+class RowHierarchy:
+    """``ContainmentHierarchy`` of a topology, with ``RoW`` defined by the face set ``row`` instead of any ``RoW`` in the topology.
+
+    Relations of ``RoW`` are computed on demand by comparing ``row`` with every location; the underlying hierarchy isn't changed or copied. ``topology`` must map ``RoW`` to ``row``."""
+
+    def __init__(
+        self, hierarchy: ContainmentHierarchy, topology: Mapping, row: Iterable
+    ):
+        self.hierarchy = hierarchy
+        self.topology = topology
+        self.row = row
+
+    def _candidates(self) -> list:
+        # A ``RoW`` usually has most faces, so collecting candidates from the
+        # inverted index is slower than testing each location
+        return [label for label in self.topology if label != "RoW"]
+
+    def within(self, label) -> list:
+        """Labels of all locations which contain ``label``, including ``label`` itself, with ``RoW`` last."""
+        if label == "RoW":
+            return [
+                other
+                for other in self._candidates()
+                if self.row <= self.topology[other]
+            ] + ["RoW"]
+        labels = [other for other in self.hierarchy.within(label) if other != "RoW"]
+        if self.topology[label] <= self.row:
+            labels.append("RoW")
+        return labels
+
+    def contained(self, label) -> list:
+        """Labels of all non-empty locations within ``label``, including ``label`` itself, with ``RoW`` last."""
+        if label == "RoW":
+            if not self.row:
+                return []
+            return [
+                other
+                for other in self._candidates()
+                if self.topology[other] and self.topology[other] <= self.row
+            ] + ["RoW"]
+        labels = [other for other in self.hierarchy.contained(label) if other != "RoW"]
+        if self.row and self.row <= self.topology[label]:
+            labels.append("RoW")
+        return labels
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import json
+import math
+import sqlite3
+import struct
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+from .lazy import LazyModule, available
+
+# Imported on first use; see ``LazyModule``
+shapely = LazyModule("shapely")
+pa = LazyModule("pyarrow")
+pq = LazyModule("pyarrow.parquet")
+
+if TYPE_CHECKING:
+    from shapely import Geometry
+
+# Constructed geometries are in geographic coordinates on WGS 84, like ``faces.gpkg``
+SRS_ID = 4326
+WGS84 = (
+    'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+    'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+    'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,'
+    'AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]]'
+)
+GPKG_APPLICATION_ID = 0x47504B47  # "GPKG"
+GPKG_VERSION = 10300
+GPKG_SCHEMA = """
+CREATE TABLE gpkg_spatial_ref_sys (
+    srs_name TEXT NOT NULL,
+    srs_id INTEGER PRIMARY KEY,
+    organization TEXT NOT NULL,
+    organization_coordsys_id INTEGER NOT NULL,
+    definition TEXT NOT NULL,
+    description TEXT
+);
+CREATE TABLE gpkg_contents (
+    table_name TEXT NOT NULL PRIMARY KEY,
+    data_type TEXT NOT NULL,
+    identifier TEXT UNIQUE,
+    description TEXT DEFAULT '',
+    last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+    min_x DOUBLE,
+    min_y DOUBLE,
+    max_x DOUBLE,
+    max_y DOUBLE,
+    srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id)
+);
+CREATE TABLE gpkg_geometry_columns (
+    table_name TEXT NOT NULL REFERENCES gpkg_contents(table_name),
+    column_name TEXT NOT NULL,
+    geometry_type_name TEXT NOT NULL,
+    srs_id INTEGER NOT NULL REFERENCES gpkg_spatial_ref_sys(srs_id),
+    z TINYINT NOT NULL,
+    m TINYINT NOT NULL,
+    PRIMARY KEY (table_name, column_name)
+);
+"""
+SPATIAL_REF_SYS = [
+    ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", None),
+    ("Undefined geographic SRS", 0, "NONE", 0, "undefined", None),
+    ("WGS 84 geodetic", SRS_ID, "EPSG", SRS_ID, WGS84, None),
+]
+
+
+def _multipolygon(geom: Geometry) -> Geometry:
+    # Layers are declared as ``MultiPolygon``
+    if geom.geom_type == "Polygon":
+        return shapely.geometry.MultiPolygon([geom])
+    return geom
+
+
+def _gpkg_blob(geom: Geometry) -> bytes:
+    """GeoPackage geometry blob: header with the 2D envelope, followed by little-endian WKB."""
+    wkb = shapely.to_wkb(geom, byte_order=1)
+    if geom.is_empty:
+        # Little-endian, no envelope, empty geometry flag
+        return struct.pack("<2sBBi", b"GP", 0, 0b10001, SRS_ID) + wkb
+    minx, miny, maxx, maxy = geom.bounds
+    # Little-endian, envelope ``[minx, maxx, miny, maxy]``
+    header = struct.pack("<2sBBi4d", b"GP", 0, 0b011, SRS_ID, minx, maxx, miny, maxy)
+    return header + wkb
+
+
+def _quote(identifier: str) -> str:
+    return '"{}"'.format(identifier.replace('"', '""'))
+
+
+def write_gpkg(fp: Path, features: Iterable[tuple[str, int, Geometry]]) -> Path:
+    """Write ``(name, id, geometry)`` ``features`` to a new GeoPackage at ``fp``, replacing any existing file.
+
+    Geometries are stored as WKB with SQLite in a single transaction, without converting them to GeoJSON-like dictionaries first. ``features`` can be a generator; each feature is written as soon as it is produced. The layer is named after the file, has ``name`` and ``id`` fields, and no spatial index."""
+    fp = Path(fp)
+    fp.unlink(missing_ok=True)
+    layer = fp.stem
+    bounds = [math.inf, math.inf, -math.inf, -math.inf]
+
+    def rows():
+        for name, id_, geom in features:
+            geom = _multipolygon(geom)
+            if not geom.is_empty:
+                minx, miny, maxx, maxy = geom.bounds
+                bounds[:] = [
+                    min(bounds[0], minx),
+                    min(bounds[1], miny),
+                    max(bounds[2], maxx),
+                    max(bounds[3], maxy),
+                ]
+            yield _gpkg_blob(geom), name, id_
+
+    connection = sqlite3.connect(fp)
+    try:
+        connection.execute("PRAGMA application_id = {}".format(GPKG_APPLICATION_ID))
+        connection.execute("PRAGMA user_version = {}".format(GPKG_VERSION))
+        connection.execute("PRAGMA journal_mode = MEMORY")
+        with connection:
+            connection.executescript("BEGIN;" + GPKG_SCHEMA)
+            connection.executemany(
+                "INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+                SPATIAL_REF_SYS,
+            )
+            connection.execute(
+                "CREATE TABLE {} (fid INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "geom MULTIPOLYGON, name TEXT, id MEDIUMINT)".format(_quote(layer))
+            )
+            connection.executemany(
+                "INSERT INTO {} (geom, name, id) VALUES (?, ?, ?)".format(
+                    _quote(layer)
+                ),
+                rows(),
+            )
+            connection.execute(
+                "INSERT INTO gpkg_contents (table_name, data_type, identifier, "
+                "min_x, min_y, max_x, max_y, srs_id) "
+                "VALUES (?, 'features', ?, ?, ?, ?, ?, ?)",
+                [layer, layer]
+                + [x if math.isfinite(x) else None for x in bounds]
+                + [SRS_ID],
+            )
+            connection.execute(
+                "INSERT INTO gpkg_geometry_columns "
+                "VALUES (?, 'geom', 'MULTIPOLYGON', ?, 0, 0)",
+                (layer, SRS_ID),
+            )
+    finally:
+        connection.close()
+    return fp
+
+
+def write_geoparquet(fp: Path, features: Iterable[tuple[str, int, Geometry]]) -> Path:
+    """Write ``(name, id, geometry)`` ``features`` to a GeoParquet file at ``fp``, with geometries as WKB in longitude and latitude (the GeoParquet default CRS). Needs ``pyarrow``."""
+    if not available("pyarrow"):
+        raise ImportError("Writing GeoParquet files needs pyarrow")
+    names, ids, geoms = [], [], []
+    for name, id_, geom in features:
+        names.append(name)
+        ids.append(id_)
+        geoms.append(_multipolygon(geom))
+    column = {"encoding": "WKB", "geometry_types": ["MultiPolygon"]}
+    if geoms and not all(geom.is_empty for geom in geoms):
+        column["bbox"] = list(shapely.total_bounds(geoms))
+    table = pa.table(
+        {
+            "name": pa.array(names, pa.string()),
+            "id": pa.array(ids, pa.int64()),
+            "geometry": pa.array(
+                [shapely.to_wkb(geom, byte_order=1) for geom in geoms], pa.binary()
+            ),
+        }
+    )
+    metadata = {
+        "version": "1.0.0",
+        "primary_column": "geometry",
+        "columns": {"geometry": column},
+    }
+    table = table.replace_schema_metadata({"geo": json.dumps(metadata)})
+    pq.write_table(table, fp)
+    return Path(fp)
+
+
+def write_geometries(fp: Path, features: Iterable[tuple[str, int, Geometry]]) -> Path:
+    """Write ``(name, id, geometry)`` ``features`` to ``fp``: GeoParquet if the suffix is ``.parquet``, otherwise a GeoPackage."""
+    if Path(fp).suffix.lower() == ".parquet":
+        return write_geoparquet(fp, features)
+    return write_gpkg(fp, features)
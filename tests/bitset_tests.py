@@ -0,0 +1,102 @@
+import pickle
+
+from constructive_geometries import Geomatcher, resolved_row
+from constructive_geometries.bitset import FaceBitset, FaceIndex
+
+
+def test_face_index_encode_decode():
+    index = FaceIndex([10, 20, 30])
+    assert index.positions == {10: 0, 20: 1, 30: 2}
+    bits = index.encode([30, 10])
+    assert bits == 0b101
+    assert sorted(index.decode(bits)) == [10, 30]
+    assert index.encode([40]) == 0b1000
+    assert 40 in index
+    assert index.encode([]) == 0
+
+
+def test_face_bitset_set_operations():
+    index = FaceIndex()
+    a = FaceBitset({1, 2, 3}, index)
+    b = FaceBitset({2, 3, 4}, index)
+
+    assert len(a) == 3
+    assert 2 in a and 4 not in a and "foo" not in a
+    assert a == {1, 2, 3}
+    assert {1, 2, 3} == a
+    assert a != b
+    assert a.intersection(b) == {2, 3}
+    assert a.union(b) == {1, 2, 3, 4}
+    assert a.difference(b) == {1}
+    assert (a & b) == {2, 3}
+    assert ({1, 2} & a) == {1, 2}
+    assert a.issuperset({1, 2}) and not a.issuperset(b)
+    assert FaceBitset({2, 3}, index).issubset(b)
+    assert a.isdisjoint({5, 6})
+    assert not FaceBitset((), index)
+
+
+def test_face_bitset_mutation():
+    index = FaceIndex()
+    a = FaceBitset({1, 2, 3}, index)
+    a.discard(2)
+    a.discard(100)
+    a.update({7, 8})
+    a.add(9)
+    assert a == {1, 3, 7, 8, 9}
+    b = a.copy()
+    b.discard(1)
+    assert 1 in a
+
+
+def test_face_bitset_pickle():
+    a = FaceBitset({1, 2, 3})
+    b = pickle.loads(pickle.dumps(a))
+    assert b == a
+
+
+def test_geomatcher_bitsets():
+    given = {
+        "A": {1, 2, 3},
+        "B": {2, 3, 4},
+        "C": {3},
+        "D": {10, 11},
+    }
+    plain = Geomatcher({k: set(v) for k, v in given.items()})
+    bitsets = Geomatcher({k: set(v) for k, v in given.items()}, use_bitsets=True)
+    assert all(isinstance(v, FaceBitset) for v in bitsets.topology.values())
+    assert bitsets.topology == given
+
+    for key in given:
+        assert bitsets.intersects(key) == plain.intersects(key)
+        assert bitsets.contained(key) == plain.contained(key)
+        assert bitsets.within(key) == plain.within(key)
+        assert bitsets.intersects(key, exclusive=True) == plain.intersects(
+            key, exclusive=True
+        )
+
+
+def test_geomatcher_bitsets_mutation():
+    g = Geomatcher({"A": {1, 2, 3}, "B": {2, 3, 4}}, use_bitsets=True)
+    g["E"] = {4, 5}
+    assert isinstance(g["E"], FaceBitset)
+    assert g.intersects("E") == ["B"]
+
+    g.split_face(3, ids={20, 21})
+    assert g["A"] == {1, 2, 20, 21}
+    assert g["B"] == {2, 4, 20, 21}
+
+    g.add_definitions({"F": ["A", "E"]}, "foo")
+    assert g[("foo", "F")] == {1, 2, 4, 5, 20, 21}
+    assert isinstance(g[("foo", "F")], FaceBitset)
+
+    g.add_definitions({"G": {30, 31}}, "foo", relative=False)
+    assert g[("foo", "G")] == {30, 31}
+    assert 30 in g.faces
+
+
+def test_geomatcher_bitsets_resolved_row():
+    g = Geomatcher({"A": {1, 2}, "B": {3, 4}, "C": {1, 2, 3, 4, 5}}, use_bitsets=True)
+    with resolved_row(["A"], g):
+        assert g["RoW"] == {3, 4, 5}
+        assert "RoW" in g.contained("C")
@@ -0,0 +1,53 @@
+import pytest
+
+from constructive_geometries.cache import GeometryCache
+
+
+def test_key():
+    assert GeometryCache.key([3, 1, 2], "abc") == GeometryCache.key({1, 2, 3}, "abc")
+    assert GeometryCache.key([1, 2, 3], "abc") != GeometryCache.key([1, 2], "abc")
+    assert GeometryCache.key([1, 2, 3], "abc") != GeometryCache.key([1, 2, 3], "d")
+
+
+def test_get_set(tmp_path):
+    cache = GeometryCache(tmp_path / "cache" / "geometries.sqlite")
+    assert cache.get("a") is None
+    cache.set("a", b"wkb")
+    assert cache.get("a") == b"wkb"
+    assert cache.report() == {"hits": 1, "misses": 1, "entries": 1, "size": 3}
+
+    # Persistent between instances
+    cache = GeometryCache(tmp_path / "cache" / "geometries.sqlite")
+    assert cache.get("a") == b"wkb"
+    cache.clear()
+    assert cache.get("a") is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = GeometryCache(tmp_path / "geometries.sqlite", max_size=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    assert cache.get("a")
+    cache.set("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.report()["size"] == 8
+
+
+def test_construct_with_cache(grid_cg, tmp_path):
+    pytest.importorskip("fiona")
+    grid_cg.geometry_cache = GeometryCache(tmp_path / "geometries.sqlite")
+    first = grid_cg.construct_rest_of_world(["LEFT"])
+    assert grid_cg.geometry_cache.report()["misses"] == 1
+
+    grid_cg._union_tree = None
+    assert grid_cg.construct_rest_of_world(["LEFT"]).equals(first)
+    assert grid_cg.geometry_cache.hits == 1
+    assert grid_cg._union_tree is None
+
+    geoms = grid_cg.construct_rest_of_worlds(
+        {"a": ["LEFT"], "b": ["R0"]}, use_mp=False, simplify=False
+    )
+    assert geoms["a"].equals(first)
+    assert geoms["b"].area == pytest.approx(40)
+    assert grid_cg.geometry_cache.report()["entries"] == 2
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+pytest.importorskip("fiona")
+pytest.importorskip("pyproj")
+pytest.importorskip("shapely")
+
+from constructive_geometries.calculate_areas import calculate_face_areas
+from constructive_geometries.geomatcher import load_face_areas
+
+
+@pytest.fixture
+def faces_fp(grid_cg):
+    return grid_cg.faces_fp
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_calculate_face_areas(faces_fp, tmp_path, processes):
+    areas = calculate_face_areas(
+        faces_fp,
+        tmp_path / "areas.json",
+        tmp_path / "areas.bin",
+        processes=processes,
+        chunk_size=7,
+    )
+    assert list(areas) == list(range(1, 51))
+    # One degree squares get smaller away from the equator
+    assert areas[1] == pytest.approx(1.23e10, rel=0.01)
+    assert areas[1] > areas[11] > areas[41]
+    assert areas[1] == pytest.approx(areas[10])
+    assert load_face_areas(tmp_path / "areas.json") == areas
+    assert load_face_areas(tmp_path / "areas.bin") == areas
+
+
+def test_calculate_face_areas_bounds_chunks_in_flight(faces_fp, tmp_path, monkeypatch):
+    import constructive_geometries.calculate_areas as module
+
+    class Result:
+        def __init__(self, pool, func, args):
+            self.pool, self.func, self.args = pool, func, args
+
+        def get(self):
+            self.pool.in_flight -= 1
+            return self.func(*self.args)
+
+    class SerialPool:
+        def __init__(self, processes):
+            self.in_flight = self.most = 0
+            pools.append(self)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+        def apply_async(self, func, args):
+            self.in_flight += 1
+            self.most = max(self.most, self.in_flight)
+            return Result(self, func, args)
+
+    pools = []
+    monkeypatch.setattr(module, "Pool", SerialPool)
+    areas = calculate_face_areas(
+        faces_fp, tmp_path / "areas.json", None, processes=3, chunk_size=1
+    )
+    assert list(areas) == list(range(1, 51))
+    assert pools[0].most == 3 * module.CHUNKS_IN_FLIGHT
+
+
+def test_calculate_face_areas_incremental(faces_fp, tmp_path, monkeypatch):
+    import constructive_geometries.calculate_areas as module
+
+    json_fp = tmp_path / "areas.json"
+    expected = calculate_face_areas(faces_fp, json_fp, None, processes=1)
+    # Fake previous results: one face with a stale area, one which no longer exists
+    previous = {face: area for face, area in expected.items() if face > 3}
+    previous.update({4: 1.0, 999: 1.0})
+    with open(json_fp, "w") as f:
+        json.dump(previous, f)
+
+    calculated = []
+    chunk_areas = module._chunk_areas
+    monkeypatch.setattr(
+        module,
+        "_chunk_areas",
+        lambda chunk: calculated.extend(face for face, _ in chunk)
+        or chunk_areas(chunk),
+    )
+    areas = calculate_face_areas(
+        faces_fp, json_fp, None, incremental=True, changed=[4], processes=1
+    )
+    assert sorted(calculated) == [1, 2, 3, 4]
+    assert areas == expected
+    assert load_face_areas(json_fp) == expected
+
+
+def test_shipped_areas_match_json():
+    from constructive_geometries.packed import DATA_DIR
+
+    assert load_face_areas(DATA_DIR / "areas.bin") == load_face_areas(
+        DATA_DIR / "areas.json"
+    )
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+import constructive_geometries.cg as cg_module
+from constructive_geometries import ConstructiveGeometries
+from constructive_geometries.cg import cached_sha256, sha256
+from constructive_geometries.packed import write_packed
+
+
+@pytest.fixture
+def hash_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONSTRUCTIVE_GEOMETRIES_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(cg_module, "_HASHES", {})
+    calls = []
+
+    def counting_sha256(filepath, *args):
+        calls.append(filepath)
+        return sha256(filepath, *args)
+
+    monkeypatch.setattr(cg_module, "sha256", counting_sha256)
+    return calls
+
+
+def test_cached_sha256(tmp_path, hash_cache):
+    fp = tmp_path / "faces.gpkg"
+    fp.write_bytes(b"some faces")
+    expected = sha256(fp)
+
+    assert cached_sha256(fp) == expected
+    assert cached_sha256(fp) == expected
+    assert len(hash_cache) == 1
+    assert (tmp_path / "cache" / "hashes.json").is_file()
+
+    # New process: only the persistent cache is available
+    cg_module._HASHES.clear()
+    assert cached_sha256(fp) == expected
+    assert len(hash_cache) == 1
+
+
+def test_cached_sha256_file_changed(tmp_path, hash_cache):
+    fp = tmp_path / "faces.gpkg"
+    fp.write_bytes(b"some faces")
+    cached_sha256(fp)
+
+    fp.write_bytes(b"other faces!")
+    stat = fp.stat()
+    os.utime(fp, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cached_sha256(fp) == sha256(fp)
+    assert len(hash_cache) == 2
+
+
+def test_cached_sha256_unwritable_cache(tmp_path, hash_cache, monkeypatch):
+    blocker = tmp_path / "blocker"
+    blocker.write_text("not a directory")
+    monkeypatch.setenv("CONSTRUCTIVE_GEOMETRIES_CACHE", str(blocker / "cache"))
+    fp = tmp_path / "faces.gpkg"
+    fp.write_bytes(b"some faces")
+    assert cached_sha256(fp) == sha256(fp)
+
+
+def test_data_is_dict():
+    cg = ConstructiveGeometries(lazy_check=True)
+    assert type(cg.data) is dict
+    assert json.loads(json.dumps(cg.data))["IE"] == cg.data["IE"]
+    cg.data["IE"].append(-1)
+    cg.data["NEW"] = [1]
+    assert cg.data["IE"][-1] == -1 and cg.data["NEW"] == [1]
+
+    from_json = ConstructiveGeometries(lazy_check=True)
+    from_json.packed_fp = from_json.packed_fp.with_name("missing.bin")
+    from_json.load_definitions()
+    assert from_json.data == ConstructiveGeometries(lazy_check=True).data
+    assert from_json.all_faces == cg.all_faces
+
+
+def test_stale_packed_definitions(tmp_path):
+    cg = ConstructiveGeometries(lazy_check=True)
+    cg.packed_fp = write_packed(tmp_path / "faces.bin", {"IE": [1]}, {}, [1], "old")
+    with pytest.warns(UserWarning, match="out of date"):
+        cg.load_definitions()
+    assert cg.data == ConstructiveGeometries(lazy_check=True).data
+
+    write_packed(cg.packed_fp, {"IE": [1]}, {}, [1], cached_sha256(cg.data_fp))
+    cg.load_definitions()
+    assert cg.data == {"IE": [1]}
+
+
+def test_lazy_check(monkeypatch):
+    def fail(self):
+        raise AssertionError
+
+    monkeypatch.setattr(ConstructiveGeometries, "check_data", fail)
+    cg = ConstructiveGeometries(lazy_check=True)
+    assert not cg.checked
+    assert cg.data["IE"]
+    with pytest.raises(AssertionError):
+        cg._ensure_checked()
@@ -0,0 +1,24 @@
+import pytest
+from grid_faces import write_grid_faces
+
+from constructive_geometries import ConstructiveGeometries
+
+
+@pytest.fixture
+def grid_cg(tmp_path):
+    """``ConstructiveGeometries`` using a synthetic 10 x 5 grid of faces.
+
+    Each row of faces is a location (``"R0"`` to ``"R4"``), each column a location (``"C0"`` to ``"C9"``), and ``"LEFT"`` is the left half of the grid."""
+    pytest.importorskip("shapely")
+    cg = ConstructiveGeometries(lazy_check=True)
+    cg.faces_fp = write_grid_faces(tmp_path / "faces.gpkg")
+    cg.checked = True
+    cg.data = {}
+    for row in range(5):
+        cg.data["R{}".format(row)] = [row * 10 + column + 1 for column in range(10)]
+    for column in range(10):
+        cg.data["C{}".format(column)] = [row * 10 + column + 1 for row in range(5)]
+    cg.data["LEFT"] = [row * 10 + column + 1 for row in range(5) for column in range(5)]
+    cg.all_faces = set(range(1, 51))
+    cg.locations = set(cg.data)
+    return cg
@@ -1,8 +1,15 @@
+import pickle
 from copy import deepcopy
 
 import pytest
 
-from constructive_geometries import ConstructiveGeometries, Geomatcher, resolved_row
+import constructive_geometries.geomatcher as geomatcher_module
+from constructive_geometries import (
+    ConstructiveGeometries,
+    FrozenGeomatcher,
+    Geomatcher,
+    resolved_row,
+)
 
 
 def test_default_setup():
@@ -100,6 +107,47 @@ def test_split_faces():
     assert g.topology == expected
 
 
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_split_faces_batch(use_bitsets):
+    given = {
+        "A": {1, 2, 3},
+        "B": {2, 3, 4},
+        "C": {7},
+    }
+    g = Geomatcher(given, use_bitsets=use_bitsets)
+    assert g.intersects("C") == []
+    result = g.split_faces({3: 2, 2: ["x", "y"], 4: {20}, 1: 1})
+    assert result == {3: {8, 9}, 2: {"x", "y"}, 4: {20}, 1: {21}}
+    assert g.topology == {
+        "A": {21, "x", "y", 8, 9},
+        "B": {"x", "y", 8, 9, 20},
+        "C": {7},
+    }
+    assert g.faces == {21, "x", "y", 7, 8, 9, 20}
+    assert g.intersects("A") == ["B"]
+    assert g.contained("A", include_self=False) == []
+    assert g.split_face(7) == {22, 23}
+
+
+@pytest.mark.parametrize("value", [0, -1, [], [2], [4], {3}])
+def test_split_faces_invalid(value):
+    g = Geomatcher({"A": {1, 2}, "B": {2, 3}}, face_areas={1: 1, 2: 1, 3: 1})
+    g.inverted_index, g.hierarchy
+    with pytest.raises(ValueError):
+        g.split_faces({2: [4], 1: value})
+    assert g.topology == {"A": {1, 2}, "B": {2, 3}}
+    assert g.faces == {1, 2, 3}
+    assert g.face_areas == {1: 1, 2: 1, 3: 1}
+    assert g.intersects("A") == ["B"]
+
+
+def test_split_faces_unknown_face():
+    g = Geomatcher({"A": {1, 2}})
+    with pytest.raises(ValueError):
+        g.split_faces({1: 2, 9: 2})
+    assert g.topology == {"A": {1, 2}}
+
+
 def test_empty_topology():
     g = Geomatcher({})
     assert g.topology == {}
@@ -170,6 +218,86 @@ def test_actual_key_coco():
         g["Austria"]
 
 
+def test_actual_key_cache():
+    g = Geomatcher({("silly", "B"): {1, 2}}, "silly")
+    assert g["B"] == {1, 2}
+    with pytest.raises(KeyError):
+        g["C"]
+    assert g._resolved == {("silly", "B"): ("silly", "B"), ("silly", "C"): None}
+
+    # Adding or removing locations invalidates cached results, also failures
+    g[("silly", "C")] = {3}
+    assert g["C"] == {3}
+    del g[("silly", "B")]
+    with pytest.raises(KeyError):
+        g["B"]
+
+    g.default_namespace = "other"
+    with pytest.raises(KeyError):
+        g["C"]
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_invalidate_after_direct_changes(use_bitsets):
+    g = Geomatcher({"A": {1, 2}, "B": {2}}, use_coco=False, use_bitsets=use_bitsets)
+    assert g.within("B") == ["A", "B"]
+    assert g.intersects("A") == ["B"]
+    with pytest.raises(KeyError):
+        g["C"]
+
+    g.topology["C"] = g._faceset({1, 2, 3})
+    g.topology["B"] = g._faceset({3})
+    g.invalidate()
+    assert g["C"] == {1, 2, 3}
+    assert g.within("B") == ["C", "B"]
+    assert g.intersects("A") == ["C"]
+
+
+def test_actual_key_cache_bounded(monkeypatch):
+    monkeypatch.setattr(geomatcher_module, "KEY_CACHE_SIZE", 2)
+    g = Geomatcher({"A": {1}}, use_coco=False)
+    for key in "BCD":
+        with pytest.raises(KeyError):
+            g[key]
+    assert list(g._resolved) == [(None, "C"), (None, "D")]
+
+
+def test_resolve_many(monkeypatch):
+    calls = []
+    convert = geomatcher_module._convert_country_names
+
+    def counting_convert(names):
+        calls.append(names)
+        return convert(names)
+
+    monkeypatch.setattr(geomatcher_module, "_convert_country_names", counting_convert)
+    monkeypatch.setattr(geomatcher_module, "_COUNTRY_NAMES", {})
+    g = Geomatcher({"AT": {1, 2}, ("silly", "B"): {3}}, "silly")
+    keys = ["Austria", "B", "AT", "Not a country", "Austria", "GLO"]
+    assert g.resolve_many(keys) == ["AT", ("silly", "B"), "AT", None, "AT", "GLO"]
+    assert calls == [["Austria", "Not a country"]]
+    assert g.resolve_many(keys)[0] == "AT"
+    assert len(calls) == 1
+
+
+def test_resolve_many_larger_than_cache(monkeypatch):
+    calls = []
+    convert = geomatcher_module._convert_country_names
+
+    def counting_convert(names):
+        calls.append(names)
+        return convert(names)
+
+    monkeypatch.setattr(geomatcher_module, "_convert_country_names", counting_convert)
+    monkeypatch.setattr(
+        geomatcher_module, "_COUNTRY_NAMES", geomatcher_module._LRUCache(2)
+    )
+    g = Geomatcher({"AT": {1}, "DE": {2}, "FR": {3}, "IT": {4}})
+    keys = ["Austria", "Germany", "France", "Italy"]
+    assert g.resolve_many(keys) == ["AT", "DE", "FR", "IT"]
+    assert calls == [sorted(keys)]
+
+
 def test_finish_filter_include_self():
     g = Geomatcher({"A": {1, 2}})
     given = [("A", 4), ("B", 6), ("C", 3)]
@@ -202,6 +330,33 @@ def test_finish_filter_exclusive():
     assert result == ["A", "D"]
 
 
+def test_finish_filter_exclusive_bitsets():
+    given = {
+        "A": {1, 2, 3},
+        "B": {2, 3, 4},
+        "C": {3, 4, 5},
+        "D": {10, 11},
+        "E": {5, 6, 10},
+        "F": set(),
+    }
+    g = Geomatcher(given, use_bitsets=True)
+    lst = [("A", 5), ("B", 6), ("C", 7), ("D", 8), ("E", 9), ("F", 0)]
+    assert g._finish_filter(lst, "A", True, True, True) == ["E", "B", "F"]
+    assert g._finish_filter(lst, "A", True, True, False) == ["F", "A", "D"]
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_exclusive_no_overlaps(use_bitsets):
+    g = Geomatcher(use_bitsets=use_bitsets)
+    result = g.intersects("GLO", exclusive=True, biggest_first=False)
+    assert len(result) > 10
+    covered = set()
+    for label in result:
+        assert covered.isdisjoint(g[label])
+        covered.update(g[label])
+    assert g.contained(("ecoinvent", "RER"), exclusive=True) == [("ecoinvent", "RER")]
+
+
 def test_finish_filter_row_ordering():
     # Test non-exclusive ordering of RoW; RoW not key
     given = {
@@ -498,6 +653,64 @@ def test_row_contextmanager_within():
         assert g.within("RoW", biggest_first=False) == ["RoW", "GLO"]
 
 
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_rest_of_worlds(use_bitsets):
+    g = Geomatcher({"A": {1, 2}, "B": {2, 3}, "C": {4}}, use_bitsets=use_bitsets)
+    rows = g.rest_of_worlds([["A"], [{"location": "B"}, "C"], ["C", "B"]])
+    assert [set(row) for row in rows] == [{3, 4}, {1}, {1}]
+    assert rows[1] is rows[2]
+    assert g.rest_of_worlds({"x": ["A", "B", "C"]}) == {"x": set()}
+    assert "RoW" not in g
+
+
+def test_rest_of_worlds_matches_resolved_row():
+    g = Geomatcher()
+    group = ["NO", "LT", {"location": "EE"}]
+    (row,) = g.rest_of_worlds([group])
+    with resolved_row(group, g):
+        assert g["RoW"] == row
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_with_row(use_bitsets):
+    g = Geomatcher(use_bitsets=use_bitsets)
+    (row,) = g.rest_of_worlds([["NO", "LT", "EE"]])
+    view = g.with_row(row)
+    assert "RoW" not in g
+    assert view["RoW"] == row
+    assert "RoW" in view.intersects(("ecoinvent", "BALTSO"))
+    assert "RoW" not in view.contained(("ecoinvent", "BALTSO"))
+    assert "RoW" in view.contained("GLO")
+    assert view.within("RoW") == ["GLO", "RoW"]
+    assert "RoW" not in g.intersects(("ecoinvent", "BALTSO"))
+
+    with resolved_row(["NO", "LT", "EE"], g):
+        for key in ["RoW", "NO", ("ecoinvent", "RER")]:
+            for method in ["intersects", "contained", "within"]:
+                for exclusive in [False, True]:
+                    expected = getattr(g, method)(key, exclusive=exclusive)
+                    given = getattr(view, method)(key, exclusive=exclusive)
+                    assert given == expected
+
+
+def test_with_row_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    g = Geomatcher(use_bitsets=True)
+    groups = [["NO"], ["DE", "FR"], ["US"], [("ecoinvent", "RER")]]
+    rows = g.rest_of_worlds(groups)
+    expected = []
+    for group in groups:
+        with resolved_row(group, g):
+            expected.append(g.intersects("RoW"))
+
+    def query(row):
+        return g.with_row(row).intersects("RoW")
+
+    with ThreadPoolExecutor(4) as executor:
+        assert list(executor.map(query, rows * 5)) == expected * 5
+
+
 def test_backwards_compatibility():
     cg = ConstructiveGeometries()
     assert "SPP" not in cg.locations
@@ -523,3 +736,365 @@ def test_backwards_compatibility():
 
     g = Geomatcher(backwards_compatible=True)
     assert ("ecoinvent", "SPP") in g
+
+
+def test_relation_matrices():
+    pytest.importorskip("scipy")
+    given = {
+        "A": {1, 2, 3},
+        "B": {2, 3, 4},
+        "C": {3},
+        "D": {10, 11},
+        "E": set(),
+    }
+    g = Geomatcher(given)
+    relations = g.relation_matrices()
+    assert relations.labels == ["A", "B", "C", "D", "E"]
+    assert relations.intersections.toarray().tolist() == [
+        [3, 2, 1, 0, 0],
+        [2, 3, 1, 0, 0],
+        [1, 1, 1, 0, 0],
+        [0, 0, 0, 2, 0],
+        [0, 0, 0, 0, 0],
+    ]
+    subsets = relations.subsets.toarray()
+    assert subsets[2].tolist() == [True, True, True, False, False]
+    assert not subsets[0, 1]
+    assert (relations.supersets.toarray() == subsets.T).all()
+    assert g.relation_matrices() is relations
+
+    g["F"] = {1, 2, 3, 4}
+    relations = g.relation_matrices()
+    assert relations.labels[-1] == "F"
+    assert relations.supersets.toarray()[-1].tolist() == [
+        True,
+        True,
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+def test_relation_matrices_consistent_with_queries():
+    pytest.importorskip("scipy")
+    g = Geomatcher()
+    relations = g.relation_matrices()
+    position = {label: i for i, label in enumerate(relations.labels)}
+    row = relations.subsets[[position["RU"]], :].toarray().ravel()
+    within = {relations.labels[i] for i in row.nonzero()[0]}
+    assert within == set(g.within("RU"))
+    row = relations.supersets[[position["US"]], :].toarray().ravel()
+    contained = {relations.labels[i] for i in row.nonzero()[0]}
+    assert contained == set(g.contained("US"))
+
+
+def area_geomatcher(**kwargs):
+    given = {"A": {1, 2, 3}, "B": {2, 3, 4}, "C": {3, 4, 5, 6}, "D": {6}}
+    areas = {1: 10.0, 2: 1.0, 3: 1.0, 4: 1.0, 5: 1.0, 6: 0.5}
+    return Geomatcher(given, face_areas=areas, **kwargs)
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_area_weighted_queries(use_bitsets):
+    pytest.importorskip("scipy")
+    g = area_geomatcher(use_bitsets=use_bitsets)
+    assert g.area("A") == 12
+    assert g.area("D") == 0.5
+    # More faces of B in C, but more area of B in A
+    assert g.intersects("B") == ["C", "A"]
+    assert g.intersects("B", by_area=True) == ["A", "C"]
+    assert g.within("D", by_area=True) == ["C", "D"]
+    assert g.contained("C", by_area=True, biggest_first=False) == ["D", "C"]
+
+
+def test_overlap_fractions():
+    pytest.importorskip("scipy")
+    g = area_geomatcher()
+    assert g.overlap_fractions("C") == pytest.approx(
+        {"B": 2 / 3.5, "A": 1 / 3.5, "D": 0.5 / 3.5}
+    )
+    assert list(g.overlap_fractions("C", include_self=True)) == ["C", "B", "A", "D"]
+    assert g.overlap_fractions("A", only=["C", "D"]) == pytest.approx({"C": 1 / 12})
+
+
+def test_overlap_fractions_rounded():
+    pytest.importorskip("scipy")
+    # Summed in a different order, the area of GLO within A is 1.0000000000000002
+    # times the area of A
+    g = Geomatcher(
+        {"A": set(range(83, 101)), "GLO": set(range(1, 101))},
+        face_areas={i: 1 / i for i in range(1, 101)},
+    )
+    assert g.overlap_fractions("A") == {"GLO": 1.0}
+    assert g.overlap_fractions("A", include_self=True) == {"A": 1.0, "GLO": 1.0}
+
+
+def test_split_face_divides_area():
+    pytest.importorskip("scipy")
+    g = area_geomatcher()
+    g.split_face(1, ids=[7, 8])
+    assert g.face_areas[7] == 5
+    assert g.area("A") == 12
+
+
+def test_face_areas_missing():
+    with pytest.raises(ValueError):
+        Geomatcher({"A": {1}}).face_areas
+
+
+def test_ecoinvent_face_areas():
+    pytest.importorskip("scipy")
+    g = Geomatcher()
+    assert len(g.face_areas) > 8000
+    # Faces only cover land
+    assert g.area("GLO") == pytest.approx(1.47e14, rel=0.01)
+    fractions = g.overlap_fractions(("ecoinvent", "RER"))
+    assert fractions["GLO"] == pytest.approx(1)
+    assert 0 < fractions["DE"] < 0.1
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_overlap_matrix(use_bitsets):
+    pytest.importorskip("scipy")
+    np = pytest.importorskip("numpy")
+    g = area_geomatcher(use_bitsets=use_bitsets)
+    fractions = g.overlap_matrix(["A", "B", "D"], ["C", "A"], dense=True)
+    assert fractions == pytest.approx(
+        np.array([[1 / 3.5, 1], [2 / 3.5, 2 / 12], [0.5 / 3.5, 0]])
+    )
+    shared = g.overlap_matrix(["A", "B", "D"], ["C", "A"], fractions=False)
+    assert shared.toarray() == pytest.approx(np.array([[1, 12], [2, 2], [0.5, 0]]))
+    counts = g.overlap_matrix(["A", "B"], ["C"], by_area=False, fractions=False)
+    assert counts.toarray().tolist() == [[1], [2]]
+
+
+def test_overlap_matrix_consistent_with_overlap_fractions():
+    pytest.importorskip("scipy")
+    g = Geomatcher()
+    suppliers = ["DE", "FR", ("ecoinvent", "RER"), "GLO", "US"]
+    matrix = g.overlap_matrix(suppliers, [("ecoinvent", "UCTE")], dense=True)
+    fractions = g.overlap_fractions(("ecoinvent", "UCTE"))
+    assert matrix[:, 0].tolist() == pytest.approx(
+        [fractions.get(k, 0) for k in suppliers]
+    )
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_freeze(use_bitsets):
+    g = Geomatcher(use_bitsets=use_bitsets)
+    frozen = g.freeze()
+    assert isinstance(frozen, FrozenGeomatcher)
+    assert frozen.freeze() is frozen
+    assert frozen["DE"] == g["DE"]
+    assert frozen["Germany"] == g["DE"]
+    assert frozen.faces == g.faces
+    for method in ["intersects", "contained", "within"]:
+        assert getattr(frozen, method)("DE") == getattr(g, method)("DE")
+    if not use_bitsets:
+        assert isinstance(frozen["DE"], frozenset)
+
+    # Snapshot doesn't follow changes of the original
+    g.split_face(next(iter(g["DE"])))
+    assert frozen["DE"] != g["DE"]
+
+
+def test_freeze_immutable():
+    frozen = Geomatcher({"A": {1, 2}, "B": {2}}).freeze()
+    with pytest.raises(TypeError):
+        frozen["C"] = {3}
+    with pytest.raises(TypeError):
+        del frozen["A"]
+    with pytest.raises(TypeError):
+        frozen.split_face(1)
+    with pytest.raises(TypeError):
+        frozen.add_definitions({"C": ["A"]}, "foo")
+    with pytest.raises(TypeError):
+        with resolved_row(["A"], frozen):
+            pass
+    with pytest.raises(TypeError):
+        frozen.invalidate()
+    assert frozen.with_row({1}).intersects("RoW") == ["A"]
+
+
+def test_freeze_pickle():
+    frozen = Geomatcher().freeze()
+    copy = pickle.loads(pickle.dumps(frozen))
+    assert copy.topology == frozen.topology
+    assert copy._hierarchy is not None and copy._inverted is not None
+    assert copy.within("DE") == frozen.within("DE")
+
+
+def test_freeze_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    frozen = Geomatcher().freeze()
+    keys = ["DE", "France", ("ecoinvent", "RER"), "US", "Not a place"] * 20
+
+    def query(key):
+        try:
+            return frozen.intersects(key, exclusive=True), frozen.within(key)
+        except KeyError:
+            return None
+
+    expected = [query(key) for key in keys]
+    with ThreadPoolExecutor(8) as executor:
+        assert list(executor.map(query, keys)) == expected
+
+
+def _shared_within(name, key):
+    frozen = FrozenGeomatcher.from_shared_memory(name)
+    return frozen.within(key), frozen.area(key)
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_pack_roundtrip(use_bitsets):
+    g = Geomatcher(use_bitsets=use_bitsets)
+    g.add_definitions({"north": ["NO", "SE", "FI"]}, "foo")
+    unpacked = FrozenGeomatcher.from_packed(g.pack())
+    assert unpacked.topology == g.topology
+    assert unpacked.faces == g.faces
+    assert (
+        unpacked.face_index is not None if use_bitsets else unpacked.face_index is None
+    )
+    assert unpacked.default_namespace == "ecoinvent"
+    for key in ["SE", ("foo", "north"), "GLO"]:
+        for method in ["intersects", "contained", "within"]:
+            assert getattr(unpacked, method)(key) == getattr(g, method)(key)
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_from_packed_is_lazy(use_bitsets):
+    pytest.importorskip("scipy")
+    g = Geomatcher(
+        {"A": {1, 2, 3}, "B": {2, 3}, "C": {3}, "D": set(), "E": {2, 3}},
+        use_bitsets=use_bitsets,
+        face_areas={1: 1.0, 2: 2.0, 3: 4.0},
+    )
+    with resolved_row(["A"], g):
+        unpacked = FrozenGeomatcher.from_packed(g.pack())
+    assert unpacked.topology._decoded == {}
+    assert unpacked.faces == {1, 2, 3}
+    assert unpacked.area("B") == 6
+    assert unpacked.overlap_fractions("A") == g.overlap_fractions("A")
+    assert unpacked["RoW"] == set()
+    assert unpacked.within("C") == ["A", "B", "E", "C"]
+    assert unpacked.contained("A") == ["A", "B", "E", "C"]
+    assert unpacked.intersects("C") == ["A", "B", "E"]
+    assert set(unpacked.topology._decoded) == {"A", "B", "C", "E", "RoW"}
+
+    copy = pickle.loads(pickle.dumps(unpacked))
+    assert copy.within("C") == unpacked.within("C")
+    assert copy.area("B") == 6
+    view, expected = unpacked.with_row({2, 3}), g.with_row({2, 3})
+    for key in ["C", "RoW"]:
+        for method in ["intersects", "contained", "within"]:
+            assert getattr(view, method)(key) == getattr(expected, method)(key)
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_pack_after_changes(use_bitsets):
+    g = Geomatcher({"A": {1, 2}}, use_coco=False, use_bitsets=use_bitsets)
+    g["B"] = {2, 3}
+    g.add_definitions({"C": {4}}, "foo", relative=False)
+    unpacked = FrozenGeomatcher.from_packed(g.pack())
+    assert unpacked.faces == {1, 2, 3, 4}
+    assert unpacked.intersects("A") == g.intersects("A") == ["B"]
+    assert unpacked.within(("foo", "C")) == [("foo", "C")]
+    assert unpacked.topology == g.topology
+
+
+def test_pack_areas_filepath():
+    pytest.importorskip("scipy")
+    g = Geomatcher()
+    unpacked = FrozenGeomatcher.from_packed(g.pack())
+    assert unpacked._face_areas is None
+    assert unpacked.area("DE") == g.area("DE")
+
+
+def test_pack_rejects_other_face_ids():
+    g = Geomatcher({"A": {1, "x"}})
+    with pytest.raises(TypeError):
+        g.pack()
+
+
+def test_shared_memory():
+    from multiprocessing import Pool
+
+    g = Geomatcher()
+    shm = g.to_shared_memory()
+    try:
+        with Pool(2) as pool:
+            results = pool.starmap(
+                _shared_within, [(shm.name, "DE"), (shm.name, ("ecoinvent", "RER"))]
+            )
+    finally:
+        shm.close()
+        shm.unlink()
+    assert results == [
+        (g.within("DE"), g.area("DE")),
+        (g.within(("ecoinvent", "RER")), g.area(("ecoinvent", "RER"))),
+    ]
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_face_locations(use_bitsets):
+    topology = {"big": {1, 2, 3, 4}, "small": {1}, "medium": {1, 2}, "other": {3}}
+    geomatcher = Geomatcher(topology, use_bitsets=use_bitsets)
+    assert geomatcher.face_locations([1, 3, 5]) == [
+        ["small", "medium", "big"],
+        ["other", "big"],
+        [],
+    ]
+
+
+def test_face_locations_by_area():
+    pytest.importorskip("scipy")
+    topology = {"a": {1, 2}, "b": {1, 3}, "c": {1, 2, 3}}
+    geomatcher = Geomatcher(topology, face_areas={1: 1, 2: 100, 3: 1})
+    assert geomatcher.face_locations([1]) == [["a", "b", "c"]]
+    assert geomatcher.face_locations([1], by_area=True) == [["b", "a", "c"]]
+
+
+def test_add_definitions_replaces_indexed_faces():
+    g = Geomatcher({"A": {1, 2, 3}})
+    g.add_definitions({"X": {1, 2}}, "ns", relative=False)
+    g.inverted_index, g.hierarchy
+    g.add_definitions({"X": {5}}, "ns", relative=False)
+    assert g.face_locations([1]) == [["A"]]
+    assert g.within("A") == ["A"]
+    g.split_face(1, ids=[10, 11])
+    assert g[("ns", "X")] == {5}
+    assert g["A"] == {2, 3, 10, 11}
+
+
+def test_row_kept_out_of_indices():
+    g = Geomatcher({"A": {1, 2}, "B": {2}, "C": {3, 4}})
+    hierarchy, inverted = g.hierarchy, g.inverted_index
+    with resolved_row(["B"], g) as x:
+        assert "RoW" not in hierarchy and "RoW" not in inverted.intersecting({1})
+        assert x.contained("RoW") == ["RoW", "C"]
+        assert set(x.within("C")) == {"RoW", "C"}
+        assert set(x.intersects("A")) == {"RoW", "B"}
+    assert g.hierarchy is hierarchy and g.inverted_index is inverted
+    assert g.contained("A") == ["A", "B"]
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_row_contained_skips_empty_locations(use_bitsets):
+    g = Geomatcher(
+        {"A": {1, 2}, "B": {3}, "C": {4}, "E": set()}, use_bitsets=use_bitsets
+    )
+    with resolved_row(["A"], g) as x:
+        assert x.contained("RoW") == ["RoW", "B", "C"]
+    assert g.with_row({3, 4}).contained("RoW") == ["RoW", "B", "C"]
+
+
+def test_split_faces_updates_row():
+    g = Geomatcher({"A": {1, 2}, "B": {3}})
+    g.inverted_index
+    g["RoW"] = {1, 3}
+    g.split_face(1, ids=[10, 11])
+    assert g["RoW"] == {3, 10, 11}
+    assert g["A"] == {2, 10, 11}
+    assert g.contained("RoW") == ["RoW", "B"]
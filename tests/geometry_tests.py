@@ -0,0 +1,265 @@
+import pytest
+
+from constructive_geometries.cg import (
+    SIMPLIFY_TOLERANCE,
+    FaceGeometries,
+    UnionTree,
+    _init_worker,
+    _union_worker,
+)
+
+pytest.importorskip("fiona")
+shapely = pytest.importorskip("shapely")
+
+
+def test_face_geometries(grid_cg):
+    faces = FaceGeometries(grid_cg.faces_fp)
+    assert len(faces) == 50
+    assert 1 in faces and 51 not in faces
+    assert faces.union([1, 2, 11, 12]).area == pytest.approx(4)
+    assert faces.union([1, 999]).area == pytest.approx(1)
+
+
+def test_face_geometries_subset(grid_cg):
+    faces = FaceGeometries(grid_cg.faces_fp, ids=[3, 4])
+    assert set(faces.wkb) == {3, 4}
+
+
+def test_face_geometries_packed(grid_cg):
+    faces = FaceGeometries(grid_cg.faces_fp)
+    copy = FaceGeometries.from_packed(*faces.pack())
+    assert len(copy) == 50
+    assert copy.union(range(1, 11)).equals(faces.union(range(1, 11)))
+
+
+def test_face_geometries_read_once(grid_cg):
+    assert grid_cg.face_geometries() is grid_cg.face_geometries()
+
+
+def test_construct_rest_of_world(grid_cg):
+    geom = grid_cg.construct_rest_of_world(["LEFT", "R0"])
+    assert geom.area == pytest.approx(20)
+    assert grid_cg.construct_rest_of_world(["LEFT"], geom=False) == set(
+        range(1, 51)
+    ).difference(grid_cg.data["LEFT"])
+
+
+def test_construct_difference(grid_cg):
+    geom = grid_cg.construct_difference("LEFT", ["C0", "R4"])
+    assert geom.area == pytest.approx(16)
+
+
+def test_worker_union(grid_cg):
+    _init_worker(grid_cg.face_geometries().pack(), grid_cg.face_order())
+    label, geom = _union_worker(("a", [1, 2, 3]))
+    assert label == "a"
+    assert geom.area == pytest.approx(3)
+
+
+def test_construct_rest_of_worlds(grid_cg):
+    geoms = grid_cg.construct_rest_of_worlds(
+        {"a": ["LEFT"], "b": ["R0", "R1"]}, use_mp=False, simplify=False
+    )
+    assert geoms["a"].area == pytest.approx(25)
+    assert geoms["b"].area == pytest.approx(30)
+
+
+def test_face_order_keeps_locations_together(grid_cg):
+    order = grid_cg.face_order()
+    assert sorted(order) == list(range(1, 51))
+    positions = sorted(order.index(face) for face in grid_cg.data["LEFT"])
+    assert positions == list(range(positions[0], positions[0] + 25))
+
+
+def test_union_tree(grid_cg):
+    faces = grid_cg.face_geometries()
+    tree = UnionTree(faces, grid_cg.face_order())
+    for ids in [range(1, 51), range(1, 26), [1, 50], [], [7, 999]]:
+        assert tree.union(ids).equals(faces.union(ids))
+    # Most pieces come from the cache on later calls
+    cached = len(tree._cache)
+    included = set(range(1, 51)).difference(grid_cg.data["R2"])
+    assert tree.union(included).area == pytest.approx(40)
+    assert len(tree._cache) == cached
+
+
+EXCLUDED = {"a": ["LEFT"], "b": ["R0", "R1"], "c": ["C0"]}
+AREAS = {"a": 25, "b": 30, "c": 45}
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_construct_rest_of_worlds_processes(grid_cg, processes):
+    geoms = grid_cg.construct_rest_of_worlds(
+        EXCLUDED, simplify=False, processes=processes
+    )
+    assert {k: v.area for k, v in geoms.items()} == pytest.approx(AREAS)
+
+
+def test_construct_rest_of_worlds_thread_executor(grid_cg):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(2) as executor:
+        geoms = grid_cg.construct_rest_of_worlds(
+            EXCLUDED, simplify=False, executor=executor
+        )
+    assert {k: v.area for k, v in geoms.items()} == pytest.approx(AREAS)
+
+
+def test_construct_rest_of_worlds_process_pool(grid_cg):
+    with grid_cg.process_pool(2) as executor:
+        first = grid_cg.construct_rest_of_worlds(
+            EXCLUDED, simplify=False, executor=executor
+        )
+        second = grid_cg.construct_rest_of_worlds(
+            {"d": ["R4"]}, simplify=False, executor=executor
+        )
+    assert {k: v.area for k, v in first.items()} == pytest.approx(AREAS)
+    assert second["d"].area == pytest.approx(40)
+
+
+def test_construct_rest_of_worlds_write_file(grid_cg, tmp_path):
+    import fiona
+
+    fp = grid_cg.construct_rest_of_worlds(
+        EXCLUDED, fp=tmp_path / "rows", processes=2, simplify=False
+    )
+    assert fp == tmp_path / "rows.gpkg"
+    with fiona.open(fp) as src:
+        features = {
+            feat["properties"]["name"]: feat["properties"]["id"] for feat in src
+        }
+    assert features == {"a": 1, "b": 2, "c": 3}
+
+
+def test_worker_union_simplified(grid_cg):
+    tree = grid_cg.union_tree()
+    _init_worker(grid_cg.face_geometries().pack(), grid_cg.face_order())
+    ids = set(range(1, 51)).difference(grid_cg.data["C4"])
+    _, geom = _union_worker(("a", ids, (0.5, True)))
+    assert geom.equals_exact(tree.union(ids).simplify(0.5), 1e-9)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_construct_rest_of_worlds_simplify_tolerance(grid_cg, processes):
+    tree = grid_cg.union_tree()
+    geoms = grid_cg.construct_rest_of_worlds(
+        EXCLUDED, simplify=0.5, preserve_topology=False, processes=processes
+    )
+    for key, locations in EXCLUDED.items():
+        included = grid_cg.all_faces.difference(
+            face for location in locations for face in grid_cg.data[location]
+        )
+        expected = tree.union(included).simplify(0.5, preserve_topology=False)
+        assert geoms[key].equals_exact(expected, 1e-9)
+
+
+def test_construct_rest_of_worlds_simplify_default(grid_cg):
+    unsimplified = grid_cg.construct_rest_of_worlds(EXCLUDED, simplify=False)
+    simplified = grid_cg.construct_rest_of_worlds(EXCLUDED, use_mp=False)
+    for key, geom in unsimplified.items():
+        assert simplified[key].equals_exact(geom.simplify(SIMPLIFY_TOLERANCE), 1e-9)
+
+
+@pytest.fixture
+def wiggly_cg(grid_cg, tmp_path):
+    """Two faces, left and right half of a 2 x 1 box, sharing a finely zig-zagged edge."""
+    from shapely.geometry import Polygon
+
+    from constructive_geometries.writers import write_gpkg
+
+    edge = [(1 + 0.01 * (i % 2), i / 100) for i in range(101)]
+    left = Polygon([(0, 0)] + edge + [(0, 1)])
+    right = Polygon([(2, 0), (2, 1)] + edge[::-1])
+    grid_cg.faces_fp = write_gpkg(
+        tmp_path / "wiggly.gpkg", [("left", 1, left), ("right", 2, right)]
+    )
+    grid_cg.data = {"LEFT": [1], "RIGHT": [2]}
+    grid_cg.all_faces = {1, 2}
+    grid_cg.locations = set(grid_cg.data)
+    return grid_cg
+
+
+def test_face_tolerance(wiggly_cg):
+    if not hasattr(shapely, "coverage_simplify"):
+        pytest.skip("Needs shapely 2.1")
+    original = wiggly_cg.face_geometries().geometries([1, 2])
+
+    wiggly_cg.face_tolerance = 0.05
+    wiggly_cg._face_geometries = None
+    wiggly_cg._union_tree = None
+    left, right = wiggly_cg.face_geometries().geometries([1, 2])
+    assert (
+        shapely.get_num_coordinates(left)
+        < shapely.get_num_coordinates(original[0]) / 10
+    )
+    # Both faces still meet along the same simplified edge
+    assert left.intersection(right).area == pytest.approx(0)
+    assert left.area + right.area == pytest.approx(2)
+    assert shapely.union(left, right).area == pytest.approx(2)
+
+    geoms = wiggly_cg.construct_rest_of_worlds(
+        {"a": ["LEFT"], "b": ["RIGHT"]}, simplify=False, use_mp=False
+    )
+    assert geoms["a"].equals(right)
+    assert geoms["b"].equals(left)
+
+
+def test_locate_points(grid_cg):
+    pytest.importorskip("numpy")
+    coordinates = [(0.5, 0.5), (9.5, 4.5), (3.2, 2.7), (20, 20), (1, 0.5), (-1, 0)]
+    assert grid_cg.locate_points(coordinates).tolist() == [1, 50, 24, -1, 1, -1]
+    assert grid_cg.locate_points([]).tolist() == []
+    assert grid_cg.face_locator() is grid_cg.face_locator()
+
+
+def test_locate_points_with_geomatcher(grid_cg):
+    np = pytest.importorskip("numpy")
+    from constructive_geometries import Geomatcher
+
+    geomatcher = Geomatcher(grid_cg.data)
+    faces = grid_cg.locate_points(
+        np.array([[0.5, 0.5], [7.5, 3.5], [0.5, 0.5], [-5, 0]])
+    )
+    locations = geomatcher.face_locations(faces)
+    assert locations == [["C0", "R0", "LEFT"], ["C7", "R3"], ["C0", "R0", "LEFT"], []]
+    assert locations[0] is locations[2]
+
+
+REGIONS = {
+    # Covers faces 1 and 2, and a quarter of faces 11 and 12
+    "bottom": "POLYGON ((0 0, 2 0, 2 1.25, 0 1.25, 0 0))",
+    # Covers most of face 50
+    "corner": "POLYGON ((9.1 4.1, 11 4.1, 11 6, 9.1 6, 9.1 4.1))",
+    "outside": "POLYGON ((20 20, 21 20, 21 21, 20 21, 20 20))",
+}
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_decompose(grid_cg, processes):
+    pytest.importorskip("numpy")
+    geoms = {label: shapely.from_wkt(wkt) for label, wkt in REGIONS.items()}
+    faces = grid_cg.decompose(geoms, processes=processes)
+    assert list(faces) == list(REGIONS)
+    assert faces == {"bottom": {1, 2}, "corner": {50}, "outside": set()}
+    assert grid_cg.decompose(geoms, threshold=0, processes=processes)["bottom"] == {
+        1,
+        2,
+        11,
+        12,
+    }
+    assert grid_cg.decompose(geoms, threshold=1)["corner"] == set()
+
+
+def test_decompose_file(grid_cg, tmp_path):
+    pytest.importorskip("numpy")
+    from constructive_geometries.writers import write_gpkg
+
+    fp = write_gpkg(
+        tmp_path / "regions.gpkg",
+        [
+            (label, i, shapely.from_wkt(wkt))
+            for i, (label, wkt) in enumerate(REGIONS.items())
+        ],
+    )
+    faces = grid_cg.decompose(fp, processes=1)
+    assert faces == {"bottom": {1, 2}, "corner": {50}, "outside": set()}
@@ -0,0 +1,33 @@
+"""Synthetic faces GeoPackage, shared by the test and benchmark fixtures."""
+import pytest
+
+
+def write_grid_faces(fp, columns=10, rows=5):
+    """Write a GeoPackage of ``columns * rows`` unit square faces with ids starting at 1, row by row from the origin."""
+    fiona = pytest.importorskip("fiona")
+    meta = {
+        "crs": "EPSG:4326",
+        "driver": "GPKG",
+        "schema": {"geometry": "Polygon", "properties": {"id": "int"}},
+    }
+    with fiona.open(fp, "w", **meta) as sink:
+        sink.writerecords(
+            {
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [
+                        [
+                            (column, row),
+                            (column + 1, row),
+                            (column + 1, row + 1),
+                            (column, row + 1),
+                            (column, row),
+                        ]
+                    ],
+                },
+                "properties": {"id": row * columns + column + 1},
+            }
+            for row in range(rows)
+            for column in range(columns)
+        )
+    return fp
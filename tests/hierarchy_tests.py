@@ -0,0 +1,147 @@
+import pytest
+
+from constructive_geometries import Geomatcher
+from constructive_geometries.bitset import FaceBitset, FaceIndex
+from constructive_geometries.hierarchy import (
+    BitsetHierarchy,
+    ContainmentHierarchy,
+    PackedHierarchy,
+)
+
+GIVEN = {
+    "A": {1, 2, 3, 4, 5, 6},
+    "B": {1, 2, 3},
+    "C": {1, 2},
+    "D": {4, 5},
+    "E": {1, 2},
+    "F": {7},
+    "G": set(),
+}
+
+
+def test_transitive_reduction():
+    h = ContainmentHierarchy(GIVEN)
+    node = lambda label: h.node_of[label]
+    assert h.labels[node("C")] == ["C", "E"]
+    assert h.parents[node("C")] == {node("B")}
+    assert h.parents[node("B")] == {node("A")}
+    assert h.children[node("A")] == {node("B"), node("D")}
+    assert h.parents[node("F")] == set()
+
+
+def test_within_contained():
+    h = ContainmentHierarchy(GIVEN)
+    assert h.within("C") == ["A", "B", "C", "E"]
+    assert h.within("F") == ["F"]
+    assert h.contained("A") == ["A", "B", "C", "D", "E"]
+    assert h.contained("G") == []
+    assert h.within("G") == list(GIVEN)
+
+
+def test_from_edges():
+    h = ContainmentHierarchy(GIVEN)
+    rebuilt = ContainmentHierarchy.from_edges(GIVEN, h.edges())
+    assert ("C", "B") in h.edges()
+    assert rebuilt.labels == h.labels
+    assert rebuilt.parents == h.parents
+    assert rebuilt.children == h.children
+    assert rebuilt.within("C") == h.within("C")
+    assert rebuilt.contained("A") == h.contained("A")
+    rebuilt.add("H", {1, 2, 3, 4})
+    assert rebuilt.within("C") == ["A", "B", "C", "E", "H"]
+
+
+def test_packed_hierarchy():
+    h = ContainmentHierarchy(GIVEN)
+    labels = list(GIVEN) + ["RoW"]
+    positions = {label: i for i, label in enumerate(labels)}
+    nodes = h.nodes()
+    assert nodes["E"] == "C"
+    packed = PackedHierarchy(
+        labels,
+        [positions[nodes[label]] if label in nodes else None for label in labels],
+        [(positions[a], positions[b]) for a, b in h.edges()],
+        [positions["G"]],
+    )
+    assert "RoW" not in packed and "E" in packed
+    assert len(packed) == len(h)
+    assert packed.nodes() == nodes
+    assert sorted(packed.edges()) == sorted(h.edges())
+    for label in GIVEN:
+        assert packed.within(label) == h.within(label)
+        assert packed.contained(label) == h.contained(label)
+
+
+def test_incremental_updates_match_rebuild():
+    topology = dict(GIVEN)
+    h = ContainmentHierarchy(topology)
+    changes = [
+        ("H", {1, 2, 3, 4}),
+        ("B", {1}),
+        ("I", {1, 2, 3, 4, 5, 6, 7}),
+        ("C", None),
+        ("E", None),
+        ("A", {1, 2, 3, 4, 5, 6, 8}),
+    ]
+    for label, faces in changes:
+        if faces is None:
+            del topology[label]
+            h.remove(label)
+        else:
+            topology[label] = faces
+            h.add(label, faces)
+        rebuilt = ContainmentHierarchy(topology)
+        assert h.parents == rebuilt.parents
+        assert h.children == rebuilt.children
+        for label in topology:
+            assert h.within(label) == rebuilt.within(label)
+            assert h.contained(label) == rebuilt.contained(label)
+
+
+def test_bitset_hierarchy_matches_sets():
+    index = FaceIndex()
+    topology = {k: FaceBitset(v, index=index) for k, v in GIVEN.items()}
+    h = BitsetHierarchy(topology, index)
+    assert h.bits[h.node_of["A"]] is topology["A"].bits
+    assert h.node_of["G"] == 0
+
+    def check():
+        expected = ContainmentHierarchy({k: set(v) for k, v in topology.items()})
+        assert sorted(h.edges()) == sorted(expected.edges())
+        assert h.nodes() == expected.nodes()
+        for label in topology:
+            assert h.within(label) == expected.within(label)
+            assert h.contained(label) == expected.contained(label)
+
+    check()
+    changes = [
+        ("H", {1, 2, 3, 4}),
+        ("B", {1}),
+        ("I", {1, 2, 3, 4, 5, 6, 7}),
+        ("C", None),
+        ("E", None),
+        ("A", {1, 2, 3, 4, 5, 6, 8}),
+    ]
+    for label, faces in changes:
+        if faces is None:
+            del topology[label]
+            h.remove(label)
+        else:
+            topology[label] = FaceBitset(faces, index=index)
+            h.add(label, topology[label])
+        check()
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_geomatcher_keeps_hierarchy_current(use_bitsets):
+    g = Geomatcher({k: set(v) for k, v in GIVEN.items()}, use_bitsets=use_bitsets)
+    assert g.within("C") == ["A", "B", "C", "E"]
+    g["H"] = {1, 2, 3, 4}
+    assert g.within("C") == ["A", "H", "B", "C", "E"]
+    del g["B"]
+    assert g.within("C") == ["A", "H", "C", "E"]
+    g.add_definitions({"X": ["D", "F"]}, "foo")
+    assert g.contained(("foo", "X")) == [("foo", "X"), "D", "F"]
+    g.split_face(4, ids={40, 41})
+    assert g.contained("D") == ["D"]
+    assert g.within("D") == ["A", ("foo", "X"), "D"]
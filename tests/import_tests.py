@@ -0,0 +1,52 @@
+import json
+import subprocess
+import sys
+
+HEAVY = ["country_converter", "fiona", "numpy", "pandas", "scipy", "shapely"]
+
+
+def imported_after(code: str) -> dict:
+    """Run ``code`` in a fresh interpreter after importing ``constructive_geometries``; return which heavy modules were imported.
+
+    Import time is measured in ``benchmarks/import_benchmarks.py``."""
+    script = """
+import json, sys
+import constructive_geometries
+{}
+print(json.dumps({{
+    "modules": [name for name in {!r} if name in sys.modules],
+}}))
+""".format(
+        code, HEAVY
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, check=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_import_is_lazy():
+    result = imported_after("")
+    assert result["modules"] == []
+
+
+def test_definitions_dont_import_heavy_modules():
+    result = imported_after(
+        """
+from constructive_geometries import ConstructiveGeometries, Geomatcher
+assert ConstructiveGeometries(lazy_check=True).data["IE"]
+g = Geomatcher()
+assert g["DE"] and g.within("DE")
+"""
+    )
+    assert result["modules"] == []
+
+
+def test_fuzzy_lookup_imports_country_converter():
+    result = imported_after(
+        """
+from constructive_geometries import Geomatcher
+assert Geomatcher()["Germany"]
+"""
+    )
+    assert "country_converter" in result["modules"]
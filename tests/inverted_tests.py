@@ -0,0 +1,91 @@
+import pytest
+
+from constructive_geometries import Geomatcher
+from constructive_geometries.bitset import FaceBitset, FaceIndex
+from constructive_geometries.inverted import (
+    BitsetInvertedIndex,
+    InvertedIndex,
+    PackedInvertedIndex,
+)
+from constructive_geometries.packed import PackedTopology, pack_topology
+
+
+def test_inverted_index():
+    index = InvertedIndex({"A": {1, 2, 3}, "B": {2, 3, 4}, "C": {10}})
+    assert index.locations[2] == {"A", "B"}
+    assert index.intersecting({3, 10}) == ["A", "B", "C"]
+    assert index.intersecting({99}) == []
+
+    index.replace("A", {1, 2, 3}, {1})
+    assert index.intersecting({2}) == ["B"]
+    assert index.intersecting({1, 2}) == ["A", "B"]
+
+    index.remove("B", {2, 3, 4})
+    assert 2 not in index
+    index.add("B", {2})
+    assert index.intersecting({1, 2}) == ["A", "B"]
+
+    assert index.split(1, {20, 21}) == {"A"}
+    assert 1 not in index
+    assert index.locations[21] == {"A"}
+
+
+def test_bitset_inverted_index():
+    face_index = FaceIndex()
+    topology = {
+        k: FaceBitset(v, index=face_index)
+        for k, v in {"A": {1, 2, 3}, "B": {2, 3, 4}, "C": {10}}.items()
+    }
+    index = BitsetInvertedIndex(topology)
+    assert index.locations[2] == 0b11
+    assert index.intersecting({3, 10}) == ["A", "B", "C"]
+    assert index.intersecting(FaceBitset({4}, index=face_index)) == ["B"]
+    assert index.intersecting({99}) == []
+
+    index.replace("A", {1, 2, 3}, {1})
+    assert index.intersecting({2}) == ["B"]
+    assert index.intersecting({1, 2}) == ["A", "B"]
+
+    index.remove("B", {2, 3, 4})
+    assert 2 not in index
+    index.add("B", {2})
+    index.add("D", {2})
+    assert index.intersecting({1, 2}) == ["A", "B", "D"]
+
+    assert index.split(1, {20, 21}) == {"A"}
+    assert 1 not in index
+    assert index.intersecting({21}) == ["A"]
+
+
+def test_packed_inverted_index():
+    data = {"A": [1, 2, 3], "B": [2, 3, 4], "C": [10], "RoW": [1, 4, 10]}
+    indexed = {k: v for k, v in data.items() if k != "RoW"}
+    packed = PackedTopology(
+        pack_topology(data, all_faces=[1, 2, 3, 4, 10], inverted=indexed)
+    )
+    index, expected = PackedInvertedIndex(packed), InvertedIndex(indexed)
+    for faces in [{3, 10}, {99}, {1}, {4, 10, 99}]:
+        assert index.intersecting(faces) == expected.intersecting(faces)
+    assert 10 in index and 99 not in index
+    with pytest.raises(ValueError):
+        PackedInvertedIndex(PackedTopology(pack_topology(data, all_faces=[1])))
+
+
+@pytest.mark.parametrize("use_bitsets", [False, True])
+def test_geomatcher_keeps_inverted_index_current(use_bitsets):
+    g = Geomatcher({"A": {1, 2, 3}, "B": {2, 3, 4}, "C": {10}}, use_bitsets=use_bitsets)
+    assert g.intersects("C") == []
+    g["D"] = {4, 10}
+    assert g.intersects("C") == ["D"]
+    g["D"] = {1}
+    assert g.intersects("C") == []
+    assert g.intersects("A") == ["B", "D"]
+    del g["B"]
+    assert g.intersects("A") == ["D"]
+    g.add_definitions({"E": {3, 10}}, "foo", relative=False)
+    assert g.intersects("C") == [("foo", "E")]
+    g.split_face(3, ids={30, 31})
+    if not use_bitsets:
+        assert g.inverted_index.locations[30] == {"A", ("foo", "E")}
+    assert g.inverted_index.intersecting({30}) == ["A", ("foo", "E")]
+    assert g.intersects(("foo", "E")) == ["A", "C"]
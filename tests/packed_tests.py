@@ -0,0 +1,126 @@
+import hashlib
+import json
+import pickle
+import subprocess
+import sys
+
+import pytest
+
+from constructive_geometries.packed import (
+    DATA_DIR,
+    PackedTopology,
+    pack_areas,
+    pack_topology,
+    unpack_areas,
+    write_packed,
+)
+
+
+def test_pack_roundtrip():
+    data = {"A": [1, 2, 3], ("foo", "B"): [2, 3, 4], "C": []}
+    packed = PackedTopology(pack_topology(data, {"sha256": "abc"}, [1, 2, 3, 4, 5]))
+    assert dict(packed) == data
+    assert list(packed) == ["A", ("foo", "B"), "C"]
+    assert packed.metadata == {"sha256": "abc"}
+    assert packed.all_faces == [1, 2, 3, 4, 5]
+    assert ("foo", "B") in packed
+    with pytest.raises(KeyError):
+        packed["D"]
+
+
+def test_pack_without_all_faces():
+    packed = PackedTopology(pack_topology({"A": [1]}))
+    assert packed.all_faces is None
+    assert packed.metadata == {}
+
+
+def test_pack_inverted_index_and_areas():
+    data = {"A": [1, 2], ("foo", "B"): [2, 3]}
+    packed = PackedTopology(
+        pack_topology(data, all_faces=[3, 1, 2], inverted=data, areas={1: 0.5, 3: 2e14})
+    )
+    assert dict(packed) == data
+    assert packed.inverted_offsets.tolist() == [0, 1, 2, 4]
+    assert packed.inverted_labels.tolist() == [1, 0, 0, 1]
+    assert packed.face_areas() == {3: 2e14, 1: 0.5}
+    with pytest.raises(ValueError):
+        pack_topology(data, inverted=data)
+    plain = PackedTopology(pack_topology(data, all_faces=[1, 2, 3]))
+    assert plain.inverted_offsets is None
+    with pytest.raises(ValueError):
+        plain.face_areas()
+
+
+def test_attach_shared_memory():
+    from multiprocessing.shared_memory import SharedMemory
+
+    data = pack_topology({"A": [1, 2]}, all_faces=[1, 2], areas={1: 1.0})
+    shm = SharedMemory(create=True, size=len(data))
+    try:
+        shm.buf[: len(data)] = data
+        packed = PackedTopology.attach(shm.name)
+        assert packed["A"] == [1, 2]
+        assert dict(pickle.loads(pickle.dumps(packed))) == {"A": [1, 2]}
+        del packed
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_attach_from_other_process_keeps_block():
+    from multiprocessing.shared_memory import SharedMemory
+
+    data = pack_topology({"A": [1, 2]}, all_faces=[1, 2])
+    shm = SharedMemory(create=True, size=len(data))
+    try:
+        shm.buf[: len(data)] = data
+        # A separate interpreter has its own resource tracker; reading its
+        # stderr to the end also waits for that tracker to exit
+        code = "from constructive_geometries.packed import PackedTopology\n"
+        code += "assert PackedTopology.attach({!r})['A'] == [1, 2]".format(shm.name)
+        result = subprocess.run(
+            [sys.executable, "-c", code], check=True, stderr=subprocess.PIPE
+        )
+        assert b"leaked" not in result.stderr
+        assert PackedTopology.attach(shm.name)["A"] == [1, 2]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_pack_rejects_other_data():
+    with pytest.raises(ValueError):
+        PackedTopology(b"not a packed topology")
+    with pytest.raises(TypeError):
+        pack_topology({"A": ["not an integer"]})
+
+
+def test_open_memory_mapped(tmp_path):
+    fp = write_packed(tmp_path / "test.bin", {"Türkiye": [7, 8]}, all_faces=[7, 8])
+    packed = PackedTopology.open(fp)
+    assert packed["Türkiye"] == [7, 8]
+    assert dict(pickle.loads(pickle.dumps(packed))) == dict(packed)
+
+
+def test_shipped_packed_file_matches_json():
+    with open(DATA_DIR / "faces.json", "rb") as f:
+        raw = f.read()
+    obj = json.loads(raw.decode("utf-8"))
+    data = dict(obj["data"])
+    all_faces = data.pop("__all__")
+
+    packed = PackedTopology.open(DATA_DIR / "faces.bin")
+    assert packed.source == hashlib.sha256(raw).hexdigest()
+    assert packed.metadata == obj["metadata"]
+    assert packed.all_faces == all_faces
+    assert dict(packed) == data
+
+
+def test_pack_areas_roundtrip():
+    areas = {3: 1.5, 1: 2e14, 2: 0.0}
+    unpacked = unpack_areas(pack_areas(areas))
+    assert unpacked == areas
+    assert list(unpacked) == [3, 1, 2]
+    assert unpack_areas(pack_areas({})) == {}
+    with pytest.raises(ValueError):
+        unpack_areas(pack_topology({"a": [1]}))
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+fiona = pytest.importorskip("fiona")
+shapely = pytest.importorskip("shapely")
+
+from shapely.geometry import MultiPolygon, Polygon, box
+
+from constructive_geometries.writers import write_geometries, write_gpkg
+
+FEATURES = [
+    ("a", 1, box(0, 0, 1, 1)),
+    ("b", 2, MultiPolygon([box(2, 0, 3, 2), box(5, 5, 6, 6)])),
+    ("c", 3, Polygon()),
+]
+
+
+def test_write_gpkg(tmp_path):
+    fp = write_gpkg(tmp_path / "rows.gpkg", iter(FEATURES))
+    with fiona.open(fp) as src:
+        assert src.crs == "EPSG:4326"
+        assert src.schema["geometry"] == "MultiPolygon"
+        assert src.bounds == (0, 0, 6, 6)
+        features = list(src)
+    assert [dict(feat["properties"]) for feat in features] == [
+        {"name": "a", "id": 1},
+        {"name": "b", "id": 2},
+        {"name": "c", "id": 3},
+    ]
+    geoms = [shapely.geometry.shape(feat["geometry"]) for feat in features]
+    assert geoms[0].geom_type == "MultiPolygon"
+    assert geoms[0].equals(FEATURES[0][2])
+    assert geoms[1].equals(FEATURES[1][2])
+    assert geoms[2].is_empty
+
+
+def test_write_gpkg_replaces_file(tmp_path):
+    fp = write_gpkg(tmp_path / "rows.gpkg", FEATURES)
+    write_gpkg(fp, FEATURES[:1])
+    with fiona.open(fp) as src:
+        assert len(src) == 1
+
+
+def test_write_geoparquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    fp = write_geometries(tmp_path / "rows.parquet", FEATURES[:2])
+    table = pq.read_table(fp)
+    metadata = json.loads(table.schema.metadata[b"geo"])
+    assert metadata["primary_column"] == "geometry"
+    assert metadata["columns"]["geometry"]["encoding"] == "WKB"
+    assert metadata["columns"]["geometry"]["bbox"] == [0, 0, 6, 6]
+    assert table.column("name").to_pylist() == ["a", "b"]
+    assert table.column("id").to_pylist() == [1, 2]
+    geoms = shapely.from_wkb(table.column("geometry").to_pylist())
+    assert geoms[1].equals(FEATURES[1][2])
+
+
+def test_construct_rest_of_worlds_geoparquet(grid_cg, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    fp = grid_cg.construct_rest_of_worlds(
+        {"a": ["LEFT"], "b": ["R0"]}, fp=tmp_path / "rows.parquet", use_mp=False
+    )
+    table = pq.read_table(fp)
+    assert sorted(
+        zip(table.column("name").to_pylist(), table.column("id").to_pylist())
+    ) == [
+        ("a", 1),
+        ("b", 2),
+    ]